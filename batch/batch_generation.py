@@ -0,0 +1,163 @@
+"""
+Generate many maps in parallel, one file per seed.
+
+Each task builds its map with its own random.Random(seed), so a map only
+depends on its seed and never on the worker count or the scheduling order.
+Maps are written in the binary map file format as soon as they are done.
+
+Usage:
+    python -m batch.batch_generation BSPDungeon --seeds 0:1000 --size 80x25 \
+        --out levels --workers 8 --param fill=True
+"""
+import argparse
+import ast
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from bsp.bsp_dungeon import BSPDungeon
+from cell.cellular_automaton_dungeon import CADungeon
+from game_map.game_map import GameMap
+from game_map.map_file import EXTENSION, save_map
+from miner.miner import Miner
+from tutorial_dungeon.tutorial_dungeon import TutorialDungeon
+
+
+def build_bsp(width, height, params, rng):
+    dungeon = BSPDungeon(GameMap(width, height), rng)
+    dungeon.generate(**params)
+    return dungeon.game_map, dungeon.rooms_list
+
+
+def build_miner(width, height, params, rng):
+    features = params.get("features", 1)
+    room_size = params.get("room_size", 5)
+    fix_bounds = params.get("fix_bounds", True)
+    miner = Miner(GameMap(width, height), rng)
+    miner.add_feature((width - room_size) // 2, (height - room_size) // 2,
+                      room_size, room_size)
+    for _ in range(features):
+        miner.generate_feature(fix_bounds=fix_bounds)
+    return miner.game_map, miner.features
+
+
+def build_tutorial(width, height, params, rng):
+    dungeon = TutorialDungeon(GameMap(width, height), rng)
+    dungeon.generate(**params)
+    return dungeon.game_map, dungeon.rooms_list
+
+
+def build_cave(width, height, params, rng):
+    params = dict(params)
+    steps = params.pop("steps", 1)
+    min_region_size = params.pop("min_region_size", None)
+    dungeon = CADungeon(width, height, rng=rng, **params)
+    dungeon.generate(steps)
+    if min_region_size is not None:
+        dungeon.connect_regions(min_region_size)
+    return dungeon.current_map, []
+
+
+GENERATORS = {
+    "BSPDungeon": build_bsp,
+    "Miner": build_miner,
+    "TutorialDungeon": build_tutorial,
+    "CADungeon": build_cave,
+}
+
+
+def map_path(output_dir, generator, seed):
+    """
+    :return str: file name used for one generated map
+    """
+    return os.path.join(output_dir, "{}_{}{}".format(generator, seed, EXTENSION))
+
+
+def generate_one(generator, seed, width, height, params, output_dir):
+    """
+    Build one map from its seed and write it to disk
+    :return int, str: the seed and the file written
+    """
+    game_map, rooms = GENERATORS[generator](width, height, params, random.Random(seed))
+    path = map_path(output_dir, generator, seed)
+    save_map(path, game_map, rooms)
+    return seed, path
+
+
+def generate_batch(generator, seeds, width, height, params=None,
+                   output_dir=".", workers=None):
+    """
+    Generate one map per seed across a pool of processes
+    :param str generator: one of GENERATORS
+    :param seeds: iterable of integer seeds
+    :param int width: Map width in tiles
+    :param int height: Map height in tiles
+    :param dict params: keyword arguments for the generator
+    :param str output_dir: directory receiving the map files
+    :param int workers: number of processes, defaults to the CPU count
+    :return: generator of (seed, path) in seed order, as maps are finished.
+        The arguments are checked and the output directory made on the call,
+        not when the first map is asked for.
+    """
+    if generator not in GENERATORS:
+        raise ValueError("Unknown generator: {}".format(generator))
+    if workers is not None and workers < 1:
+        raise ValueError("workers must be at least 1")
+    params = params or {}
+    seeds = list(seeds)
+    os.makedirs(output_dir, exist_ok=True)
+    return _generate_batch(generator, seeds, width, height, params, output_dir, workers)
+
+
+def _generate_batch(generator, seeds, width, height, params, output_dir, workers):
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        count = len(seeds)
+        yield from pool.map(generate_one, [generator] * count, seeds,
+                            [width] * count, [height] * count,
+                            [params] * count, [output_dir] * count,
+                            chunksize=max(1, count // (8 * (workers or os.cpu_count() or 1))))
+
+
+def parse_seeds(text):
+    """
+    :param str text: "start:stop" range or comma separated seeds
+    :return list: seeds
+    """
+    if ":" in text:
+        start, stop = text.split(":")
+        return list(range(int(start), int(stop)))
+    return [int(seed) for seed in text.split(",")]
+
+
+def parse_param(text):
+    """
+    :param str text: key=value, value read as a Python literal when possible
+    :return str, value:
+    """
+    key, _, value = text.partition("=")
+    try:
+        return key, ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return key, value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a batch of maps")
+    parser.add_argument("generator", choices=sorted(GENERATORS))
+    parser.add_argument("--seeds", default="0:10", help="start:stop or a,b,c")
+    parser.add_argument("--size", default="80x25", help="WIDTHxHEIGHT")
+    parser.add_argument("--out", default="maps", help="output directory")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--param", action="append", default=[],
+                        help="generator parameter as key=value, may be repeated")
+    args = parser.parse_args(argv)
+
+    width, height = (int(value) for value in args.size.lower().split("x"))
+    params = dict(parse_param(param) for param in args.param)
+    for seed, path in generate_batch(args.generator, parse_seeds(args.seeds),
+                                     width, height, params, args.out, args.workers):
+        print(seed, path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Compare BSPDungeon corridor modes: rooms joined in list order versus
+sibling subtrees joined through the tree.
+Usage: python -m benchmarks.bsp_corridors [size]
+"""
+import random
+import sys
+import time
+
+from bsp.bsp_dungeon import BSPDungeon
+from game_map.game_map import GameMap
+from game_map.instrumentation import GenerationStats
+
+
+def run(size, corridors, seed=0):
+    """
+    :return float, int, int: corridor time, corridor tile writes, tiles opened by corridors
+    """
+    stats = GenerationStats()
+    dungeon = BSPDungeon(GameMap(size, size), random.Random(seed), engine="flat", stats=stats)
+    segments = dungeon.plan(corridors=corridors)
+    open_before = dungeon.game_map.block_move_plane.count(0)
+    start = time.perf_counter()
+    dungeon.dig_segments(segments)
+    elapsed = time.perf_counter() - start + stats.phases["corridors"]["seconds"]
+    opened = dungeon.game_map.block_move_plane.count(0) - open_before
+    return elapsed, dungeon.corridor_tiles, opened
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    print("{0}x{0} map".format(size))
+    print("{:>12} {:>10} {:>12} {:>12}".format("corridors", "time (s)", "tile writes", "tiles dug"))
+    for mode in ("sequential", "tree"):
+        elapsed, writes, opened = run(size, mode)
+        print("{:>12} {:>10.3f} {:>12} {:>12}".format(mode, elapsed, writes, opened))
@@ -0,0 +1,34 @@
+"""
+Compare the full-grid CADungeon step with the incremental (active cell) step.
+Usage: python -m benchmarks.ca_incremental [size] [steps]
+"""
+import random
+import sys
+import time
+
+from cell.cellular_automaton_dungeon import CADungeon
+
+
+def time_generate(backend, size, steps, seed=0):
+    """
+    :return float, str: seconds taken, printable map for comparison
+    """
+    random.seed(seed)
+    dungeon = CADungeon(size, size, 45, 1, 4, backend=backend)
+    start = time.perf_counter()
+    dungeon.generate(steps, stop_early=False)
+    return time.perf_counter() - start, repr(dungeon)
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    full_time, full_map = time_generate("python", size, steps)
+    incremental_time, incremental_map = time_generate("incremental", size, steps)
+
+    print("{0}x{0} cave, {1} steps".format(size, steps))
+    print("Full sweep:  {:8.3f}s".format(full_time))
+    print("Incremental: {:8.3f}s ({:.1f}x faster)".format(
+        incremental_time, full_time / incremental_time))
+    print("Identical output: {}".format(full_map == incremental_map))
@@ -0,0 +1,209 @@
+"""
+Time and memory-profile every generator over a matrix of map sizes,
+parameters and seeds.
+
+Results are written as JSON. When a baseline file from an earlier run is
+given, every case is compared with it and the exit code is 1 if any case
+got slower or bigger than the allowed tolerance.
+
+Each case is timed --repeat times and the best time is kept, which is the
+least noisy estimate of what the code itself costs; the median is recorded
+too.
+
+Usage:
+    python -m benchmarks.generation --output results.json
+    python -m benchmarks.generation --baseline results.json --tolerance 0.25
+    python -m benchmarks.generation --full    # adds 2000x2000 and 4000x4000
+    python -m benchmarks.generation --repeat 5
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from batch.batch_generation import GENERATORS, parse_seeds
+from game_map.game_map import GameMap
+from miner import miner_old
+from miner.miner import Miner
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+SIZES = [(80, 25), (400, 200), (1000, 1000)]
+FULL_SIZES = SIZES + [(2000, 2000), (4000, 4000)]
+CA_BACKEND = "numpy" if numpy is not None else "incremental"
+
+# Differences below this many seconds are treated as noise
+MIN_TIME_DELTA = 0.01
+
+
+def build_miner_generate(width, height, params, rng):
+    miner = Miner(GameMap(width, height), rng)
+    miner.generate(params.get("features", 1))
+    return miner.game_map, miner.features
+
+
+def build_miner_old(width, height, params, rng):
+    miner = miner_old.Miner(GameMap(width, height), rng)
+    miner.generate_features(params.get("features", 10), params.get("min_features", 5))
+    return miner.game_map, miner.features
+
+
+# The batch generators, and the other Miner drivers
+BUILDERS = dict(GENERATORS, MinerGenerate=build_miner_generate, MinerOld=build_miner_old)
+
+
+def cases(sizes, generators=None):
+    """
+    Yield (generator, width, height, params) for the benchmark matrix
+    :param list sizes: (width, height) pairs
+    :param generators: names to keep, all of them if None
+    """
+    for width, height in sizes:
+        rooms = min(max(10, width * height // 400), 5000)
+        matrix = [
+            ("BSPDungeon", {"fill": True}),
+            ("BSPDungeon", {"fill": False, "corridors": "tree"}),
+            ("TutorialDungeon", {"max_rooms": rooms}),
+            ("TutorialDungeon", {"max_rooms": rooms, "placement": "free_space"}),
+            ("Miner", {"features": rooms}),
+            ("MinerGenerate", {"features": rooms}),
+            ("MinerOld", {"features": rooms}),
+            ("CADungeon", {"steps": 50, "initial_live_chance": 45, "death_limit": 1,
+                           "birth_limit": 4, "backend": CA_BACKEND}),
+        ]
+        for name, params in matrix:
+            if generators is None or name in generators:
+                yield name, width, height, params
+
+
+def case_key(name, width, height, params, seed):
+    """
+    :return str: identifier used to match a case against the baseline
+    """
+    options = ",".join("{}={}".format(key, params[key]) for key in sorted(params))
+    return "{} {}x{} {} seed={}".format(name, width, height, options, seed)
+
+
+def run_case(name, width, height, params, seed, memory=True, repeat=1):
+    """
+    Build one map, repeat times timed and once with tracemalloc
+    :param int repeat: timed runs; the best is kept as "seconds"
+    :return dict: result record
+    """
+    record = {"key": case_key(name, width, height, params, seed), "generator": name,
+              "width": width, "height": height, "params": params, "seed": seed}
+    build = BUILDERS[name]
+    try:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            build(width, height, params, random.Random(seed))
+            times.append(time.perf_counter() - start)
+        record["seconds"] = min(times)
+        record["median_seconds"] = statistics.median(times)
+        record["repeat"] = repeat
+        if memory:
+            tracemalloc.start()
+            try:
+                build(width, height, params, random.Random(seed))
+                record["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+    except Exception as error:
+        record["error"] = "{}: {}".format(type(error).__name__, error)
+    return record
+
+
+def compare(results, baseline, tolerance, memory_tolerance):
+    """
+    :return list: descriptions of every regression against the baseline
+    """
+    previous = {record["key"]: record for record in baseline.get("results", [])}
+    regressions = []
+    for record in results:
+        old = previous.get(record["key"])
+        if old is None:
+            continue
+        if "error" in record and "error" not in old:
+            regressions.append("{}: now fails ({})".format(record["key"], record["error"]))
+            continue
+        if "seconds" in record and "seconds" in old:
+            limit = old["seconds"] * (1 + tolerance)
+            if record["seconds"] > limit and record["seconds"] - old["seconds"] > MIN_TIME_DELTA:
+                regressions.append("{}: {:.3f}s, baseline {:.3f}s".format(
+                    record["key"], record["seconds"], old["seconds"]))
+        if "peak_bytes" in record and "peak_bytes" in old:
+            if record["peak_bytes"] > old["peak_bytes"] * (1 + memory_tolerance):
+                regressions.append("{}: peak {} bytes, baseline {}".format(
+                    record["key"], record["peak_bytes"], old["peak_bytes"]))
+    return regressions
+
+
+def parse_sizes(text):
+    """
+    :param str text: comma separated WIDTHxHEIGHT values
+    :return list: (width, height) pairs
+    """
+    return [tuple(int(value) for value in size.lower().split("x")) for size in text.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dungeon generators")
+    parser.add_argument("--sizes", type=parse_sizes, default=None, help="e.g. 80x25,400x200")
+    parser.add_argument("--full", action="store_true", help="include 2000x2000 and 4000x4000")
+    parser.add_argument("--seeds", default="0", help="start:stop or a,b,c")
+    parser.add_argument("--generators", default=None, help="comma separated names")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", default=None, help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed time increase")
+    parser.add_argument("--memory-tolerance", type=float, default=0.10,
+                        help="allowed peak memory increase")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc runs")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="timed runs per case, the best is kept")
+    args = parser.parse_args(argv)
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    # Read the baseline before anything is written, as --output may be the same file
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as stream:
+            baseline = json.load(stream)
+
+    sizes = args.sizes or (FULL_SIZES if args.full else SIZES)
+    generators = args.generators.split(",") if args.generators else None
+    results = []
+    for name, width, height, params in cases(sizes, generators):
+        for seed in parse_seeds(args.seeds):
+            record = run_case(name, width, height, params, seed, not args.no_memory,
+                              args.repeat)
+            results.append(record)
+            if "error" in record:
+                print("{:<100} ERROR {}".format(record["key"], record["error"]))
+            elif "peak_bytes" in record:
+                print("{:<100} {:9.3f}s {:10.1f} MB".format(
+                    record["key"], record["seconds"], record["peak_bytes"] / 2 ** 20))
+            else:
+                print("{:<100} {:9.3f}s".format(record["key"], record["seconds"]))
+
+    with open(args.output, "w") as stream:
+        json.dump({"python": sys.version.split()[0], "results": results}, stream, indent=1)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance, args.memory_tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
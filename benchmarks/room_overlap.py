@@ -0,0 +1,44 @@
+"""
+Room rejection tests with a linear scan versus SpatialIndex, as the number
+of placed rooms grows.
+Usage: python -m benchmarks.room_overlap [map_size]
+"""
+import random
+import sys
+import time
+
+from game_map.rect import Rect
+from game_map.spatial_index import SpatialIndex
+
+
+def place_rooms(attempts, map_size, use_index, seed=0):
+    """
+    Place random rooms, rejecting any that overlap an earlier room
+    :return float, int: seconds taken, rooms placed
+    """
+    rng = random.Random(seed)
+    rooms = []
+    index = SpatialIndex()
+    start = time.perf_counter()
+    for _ in range(attempts):
+        w, h = rng.randint(5, 10), rng.randint(5, 10)
+        room = Rect(rng.randint(0, map_size - w - 1), rng.randint(0, map_size - h - 1), w, h)
+        if use_index:
+            if index.intersects(room):
+                continue
+            index.insert(room)
+        elif any(room.intersect(other) for other in rooms):
+            continue
+        rooms.append(room)
+    return time.perf_counter() - start, len(rooms)
+
+
+if __name__ == "__main__":
+    map_size = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print("{0}x{0} map".format(map_size))
+    print("{:>8} {:>8} {:>12} {:>12}".format("attempts", "rooms", "scan (s)", "index (s)"))
+    for attempts in (500, 2000, 8000, 32000):
+        scan_time, scan_rooms = place_rooms(attempts, map_size, False)
+        index_time, index_rooms = place_rooms(attempts, map_size, True)
+        assert scan_rooms == index_rooms
+        print("{:>8} {:>8} {:>12.3f} {:>12.3f}".format(attempts, index_rooms, scan_time, index_time))
@@ -0,0 +1,54 @@
+"""
+Compare memory use and clear time of the packed GameMap tile planes
+against the old list-of-lists of Tile objects.
+Usage: python -m benchmarks.tile_storage [width] [height]
+"""
+import sys
+import time
+import tracemalloc
+
+from game_map.game_map import GameMap
+from game_map.tile import Tile
+
+
+def tile_object_grid(width, height):
+    """
+    Build the grid the way GameMap.clear_map used to
+    """
+    return [[Tile() for _ in range(height)] for _ in range(width)]
+
+
+def measure(build):
+    """
+    Time a builder and record its peak traced allocation
+    :param build: zero-argument callable returning the structure to keep
+    :return float, int: seconds taken, peak bytes allocated
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak
+
+
+def packed_map(width, height):
+    game_map = GameMap(width, height)
+    game_map.clear_map()
+    return game_map
+
+
+if __name__ == "__main__":
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    packed_time, packed_peak = measure(lambda: packed_map(width, height))
+    objects_time, objects_peak = measure(lambda: tile_object_grid(width, height))
+
+    print("{}x{} tiles".format(width, height))
+    print("Tile objects: {:8.3f}s {:10.1f} MB".format(objects_time, objects_peak / 2 ** 20))
+    print("Packed planes: {:7.3f}s {:10.1f} MB".format(packed_time, packed_peak / 2 ** 20))
+    print("Memory saved: {:.1f} MB ({:.0f}x smaller)".format(
+        (objects_peak - packed_peak) / 2 ** 20, objects_peak / max(packed_peak, 1)))
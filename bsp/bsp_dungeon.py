@@ -1,6 +1,11 @@
-from random import randint
 from game_map.game_map import GameMap
+from game_map.instrumentation import timed_phase
+from game_map.rect import Rect
+from game_map.render import check_band
+from game_map.rng import as_random
+from game_map.room_graph import RoomGraph
 from bsp.bsp_leaf import Leaf
+from bsp.bsp_tree import BSPTree
 
 
 class BSPDungeon:
@@ -15,12 +20,26 @@ class BSPDungeon:
       Connect adjacent spaces
     """
 
-    def __init__(self, game_map):
+    def __init__(self, game_map, rng=None, engine="leaf", stats=None):
         """
         :param GameMap game_map:
+        :param rng: random number generator, random.Random(seed) or a numpy
+            Generator, defaults to the random module
+        :param str engine: "leaf" builds a tree of Leaf objects recursively;
+            "flat" uses a BSPTree of flat arrays and explicit stacks, for
+            large maps or small leaves. Both give the same map for a seed.
+        :param GenerationStats stats: optional, collects phase timings and counters
         """
+        if engine not in ("leaf", "flat"):
+            raise ValueError("Unknown BSP engine: {}".format(engine))
+        self.rng = as_random(rng)
+        self.engine = engine
+        self.stats = stats
         self.root = None
         self.rooms_list = []
+        self._room_graph = None
+        # Number of tile writes made while digging corridors
+        self.corridor_tiles = 0
         self.game_map = game_map
         self.width = self.game_map.width
         self.height = self.game_map.height
@@ -29,66 +48,224 @@ class BSPDungeon:
 
     def init_tree(self):
         """Set up an empty map grid"""
-        self.root = Leaf(0, 0, self.width, self.height)
+        if self.engine == "flat":
+            self.root = BSPTree(0, 0, self.width, self.height)
+        else:
+            self.root = Leaf(0, 0, self.width, self.height)
 
-    def generate(self, fill=False):
+    def generate(self, fill=False, corridors="sequential"):
+        """
+        :param bool fill: If True, rooms take up the entirety of a node
+        :param str corridors: "sequential" joins each room to the next one in
+            the list; "tree" joins sibling subtrees bottom-up through the BSP
+            tree, which gives much shorter corridors on large maps
+        """
+        _check_corridor_mode(corridors)
+        self._plan(fill, corridors, dig=True)
+
+    def plan(self, fill=False, corridors="sequential"):
+        """
+        Split the space and draw the rooms, but only plan the corridors.
+        Digging the returned segments with dig_segments gives the same map
+        as generate.
+        :param bool fill: see generate
+        :param str corridors: see generate
+        :return list: corridor segments as Rects, in digging order
+        """
+        _check_corridor_mode(corridors)
+        return self._plan(fill, corridors)
+
+    def _plan(self, fill, corridors, dig=False):
+        self._room_graph = None
         self._split()
         self._generate_rooms(fill)
-        self._generate_corridors()
+        self._fill_grid()
+        if corridors == "tree":
+            return self._generate_tree_corridors(dig)
+        return self._generate_corridors(dig)
+
+    @property
+    def room_graph(self):
+        """
+        :return RoomGraph: rooms and corridors of the generated map, built on first use
+        """
+        if self._room_graph is None:
+            # Rooms are drawn on the tiles x1..x2 - 1, y1..y2 - 1, walls included
+            extents = [(room.x1, room.y1, room.x2 - 1, room.y2 - 1) for room in self.rooms_list]
+            self._room_graph = RoomGraph(self.game_map, self.rooms_list, extents)
+        return self._room_graph
+
+    def stream(self, fill=False, corridors="sequential", band=64,
+               block_char="#", open_char="."):
+        """
+        Generate the dungeon while yielding it rendered a band of rows at a
+        time. The rooms are drawn and the corridors planned first; the
+        corridors are then dug from the top of the map down, and each band
+        is yielded as soon as no corridor left to dig reaches it. The map
+        is the same as the one generate makes.
+        :param bool fill: see generate
+        :param str corridors: see generate
+        :param int band: most rows per band
+        :param block_char: symbol to represent a sight-blocking tile
+        :param open_char: symbol to represent a see-through tile
+        :return: generator of str, every row newline-terminated
+        """
+        _check_corridor_mode(corridors)
+        check_band(band)
+        return self._stream(fill, corridors, band, block_char, open_char)
+
+    def _stream(self, fill, corridors, band, block_char, open_char):
+        segments = self._plan(fill, corridors)
+        yield from self.game_map.iter_bands_digging(segments, self._dig, band,
+                                                    block_char, open_char)
 
+    @timed_phase("split")
     def _split(self):
         """
         Divide the space into leaves on a binary spanning tree
         """
         if self.root:
-            self.root.split()
+            self.root.split(self.rng)
 
+    @timed_phase("generate_rooms")
     def _generate_rooms(self, fill=False):
         """
         Fill each child node of the tree with a room
         Collect all created rooms into a list
         :param bool fill: If True, rooms take up the entirety of a node
         """
-        if self.root:
-            self.root.generate_room(fill)
+        if self.engine == "flat":
+            self.root.generate_rooms(fill, self.rng)
+        elif self.root:
+            self.root.generate_room(fill, self.rng)
         self.root.get_rooms(self.rooms_list)
-        self._fill_grid()
+        if self.stats is not None:
+            self.stats.count("rooms", len(self.rooms_list))
 
+    @timed_phase("fill_grid")
     def _fill_grid(self):
         """
         Draw the rooms into the map grid
         """
         for room in self.rooms_list:
-            for x in range(room.x1, room.x2):
-                for y in range(room.y1, room.y2):
-                    if x == room.x1 or x == room.x2 - 1 or y == room.y1 or y == room.y2 - 1:
-                        self.game_map.tiles[x][y].block(True)
-                    else:
-                        self.game_map.tiles[x][y].block(False)
+            self.game_map.apply_ops((
+                ("fill_rect", room.x1 + 1, room.y1 + 1, room.x2 - 2, room.y2 - 2, False),
+                ("outline_rect", room.x1, room.y1, room.x2 - 1, room.y2 - 1, True),
+            ))
+            if self.stats is not None:
+                self.stats.count("tiles_written", max(room.width, 0) * max(room.height, 0))
 
-    def _generate_corridors(self):
+    @timed_phase("corridors")
+    def _generate_corridors(self, dig=True):
         """
         Add connecting corridors between rooms
+        :param bool dig: dig the corridors, or only plan them
+        :return list: corridor segments as Rects
         """
-        first_room = True
-        new_x, new_y = 0, 0
-        for room in self.rooms_list:
-            if first_room:
-                first_room = False
-                new_x, new_y = room.center()
-            else:
-                prev_x, prev_y = new_x, new_y
-                new_x, new_y = room.center()
-                # Randomly determine corridor arrangement.
-                if randint(0, 1) == 1:
-                    # Horizontal tunnel, then Vertical
-                    self._create_h_tunnel(prev_x, new_x, prev_y)
-                    self._create_v_tunnel(prev_y, new_y, new_x)
-                else:
-                    # Vertical tunnel, then Horizontal
-                    self._create_v_tunnel(prev_y, new_y, prev_x)
-                    self._create_h_tunnel(prev_x, new_x, new_y)
-                pass
+        segments = []
+        for previous, room in zip(self.rooms_list, self.rooms_list[1:]):
+            segments.extend(self._connect_points(*previous.center(), *room.center()))
+        if dig:
+            self.dig_segments(segments)
+        return segments
+
+    @timed_phase("corridors")
+    def _generate_tree_corridors(self, dig=True):
+        """
+        Add corridors between sibling subtrees, from the bottom of the tree up.
+        Each split gets one corridor, between the room of the first subtree
+        closest to the area of the second subtree, and the room of the second
+        subtree closest to that one. The corridors are recorded on the split node.
+        :param bool dig: dig the corridors, or only plan them
+        :return list: corridor segments as Rects
+        """
+        segments = []
+        # Rooms below each child not yet merged into its parent
+        subtree_rooms = {}
+        for node, first, second in self._sibling_pairs():
+            first_rooms = subtree_rooms.pop(first, None) or [self._node_room(first)]
+            second_rooms = subtree_rooms.pop(second, None) or [self._node_room(second)]
+            bounds = self._node_bounds(second)
+            room_a = min(first_rooms, key=lambda room: _distance_to_bounds(room.center(), bounds))
+            a_x, a_y = room_a.center()
+            room_b = min(second_rooms, key=lambda room: _distance(room.center(), a_x, a_y))
+            b_x, b_y = room_b.center()
+            corridor = self._connect_points(a_x, a_y, b_x, b_y)
+            self._add_node_corridors(node, corridor)
+            segments.extend(corridor)
+            first_rooms.extend(second_rooms)
+            subtree_rooms[node] = first_rooms
+        if dig:
+            self.dig_segments(segments)
+        return segments
+
+    def _sibling_pairs(self):
+        """
+        Yield (node, first child, second child) for every split, children first
+        """
+        if self.engine == "flat":
+            for node in self.root.internal_nodes():
+                first = self.root.first_child[node]
+                yield node, first, first + 1
+        else:
+            for leaf in self.root.internal_nodes():
+                yield leaf, leaf.children[0], leaf.children[1]
+
+    def _node_room(self, node):
+        if self.engine == "flat":
+            return self.root.room[node]
+        return node.room
+
+    def _node_bounds(self, node):
+        """
+        :return int, int, int, int: x1, y1, x2, y2 covered by a node
+        """
+        if self.engine == "flat":
+            tree = self.root
+            x, y = tree.x[node], tree.y[node]
+            return x, y, x + tree.width[node] - 1, y + tree.height[node] - 1
+        return node.x, node.y, node.x + node.width - 1, node.y + node.height - 1
+
+    def _add_node_corridors(self, node, corridors):
+        if self.engine == "flat":
+            self.root.corridors.setdefault(node, []).extend(corridors)
+        else:
+            node.corridors.extend(corridors)
+
+    def _connect_points(self, x1, y1, x2, y2):
+        """
+        Plan an L-shaped corridor between two points
+        :return list: the two corridor segments as Rects, in digging order
+        """
+        if self.stats is not None:
+            self.stats.count("corridors")
+            self.stats.count("tiles_written", abs(x2 - x1) + abs(y2 - y1) + 2)
+        # Randomly determine corridor arrangement.
+        if self.rng.randint(0, 1) == 1:
+            # Horizontal tunnel, then Vertical
+            return [Rect(min(x1, x2), y1, abs(x2 - x1), 0),
+                    Rect(x2, min(y1, y2), 0, abs(y2 - y1))]
+        # Vertical tunnel, then Horizontal
+        return [Rect(x1, min(y1, y2), 0, abs(y2 - y1)),
+                Rect(min(x1, x2), y2, abs(x2 - x1), 0)]
+
+    def dig_segments(self, segments):
+        """
+        Dig corridor segments, e.g. those returned by plan
+        :param list segments: Rects from plan
+        """
+        for segment in segments:
+            self._dig(segment)
+
+    def _dig(self, segment):
+        """
+        Dig one corridor segment
+        :param Rect segment: a segment from _connect_points
+        """
+        if segment.height == 0:
+            self._create_h_tunnel(segment.x1, segment.x2, segment.y1)
+        else:
+            self._create_v_tunnel(segment.y1, segment.y2, segment.x1)
 
     def _create_h_tunnel(self, x1, x2, y):
         """
@@ -97,8 +274,8 @@ class BSPDungeon:
         :param int x2: End of Tunnel
         :param int y: The y position of the tunnel
         """
-        for x in range(min(x1, x2), max(x1, x2) + 1):
-            self.game_map.tiles[x][y].block(False)
+        self.corridor_tiles += abs(x2 - x1) + 1
+        self.game_map.create_h_tunnel(x1, x2, y)
 
     def _create_v_tunnel(self, y1, y2, x):
         """
@@ -107,8 +284,29 @@ class BSPDungeon:
         :param int y2: End of Tunnel
         :param int x: X position of the tunnel
         """
-        for y in range(min(y1, y2), max(y1, y2) + 1):
-            self.game_map.tiles[x][y].block(False)
+        self.corridor_tiles += abs(y2 - y1) + 1
+        self.game_map.create_v_tunnel(y1, y2, x)
+
+
+def _check_corridor_mode(corridors):
+    if corridors not in ("sequential", "tree"):
+        raise ValueError("Unknown corridor mode: {}".format(corridors))
+
+
+def _distance(point, x, y):
+    """
+    Manhattan distance from a point to (x, y)
+    """
+    return abs(point[0] - x) + abs(point[1] - y)
+
+
+def _distance_to_bounds(point, bounds):
+    """
+    Manhattan distance from a point to the nearest tile of an area
+    :param bounds: x1, y1, x2, y2 of the area
+    """
+    x1, y1, x2, y2 = bounds
+    return max(x1 - point[0], 0, point[0] - x2) + max(y1 - point[1], 0, point[1] - y2)
 
 
 if __name__ == "__main__":
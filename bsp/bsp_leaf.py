@@ -1,4 +1,4 @@
-from random import random, randint
+import random
 
 from game_map.rect import Rect
 
@@ -18,10 +18,11 @@ class Leaf:
         self.room = None
         self.corridors = []
 
-    def split(self):
+    def split(self, rng=random):
         """
         Attempt to divide this node into 2 smaller nodes
         If successful, call split on each child node
+        :param rng: random number generator, defaults to the random module
         :return: False if the node cannot be split
         """
         if self.width > 1.25 * self.height:
@@ -29,7 +30,7 @@ class Leaf:
         elif self.height > 1.25 * self.width:
             split_horizontal = True
         else:
-            split_horizontal = random() < 0.5
+            split_horizontal = rng.random() < 0.5
 
         if split_horizontal:
             split_max = self.height - Leaf.MIN_LEAF_SIZE
@@ -39,7 +40,7 @@ class Leaf:
         if split_max < Leaf.MIN_LEAF_SIZE:
             return False
 
-        split = randint(Leaf.MIN_LEAF_SIZE, split_max)
+        split = rng.randint(Leaf.MIN_LEAF_SIZE, split_max)
 
         if split_horizontal:
             self.children.append(Leaf(self.x, self.y, self.width, split))
@@ -49,18 +50,19 @@ class Leaf:
             self.children.append(Leaf(self.x + split, self.y, self.width - split, self.height))
 
         for leaf in self.children:
-            leaf.split()
+            leaf.split(rng)
 
         return True
 
-    def generate_room(self, fill=False):
+    def generate_room(self, fill=False, rng=random):
         """
         Create a room within the node
         :param bool fill: Room fills node completely
+        :param rng: random number generator, defaults to the random module
         """
         if self.children:
             for leaf in self.children:
-                leaf.generate_room(fill)
+                leaf.generate_room(fill, rng)
         else:
             if fill:
                 if self.x > 0:
@@ -71,12 +73,21 @@ class Leaf:
                     self.height += 1
                 self.room = Rect(self.x, self.y, self.width, self.height)
             else:
-                dx = randint(0, 3)
-                dy = randint(0, 3)
-                width = randint(self.width - 3, self.width) - dx
-                height = randint(self.height - 3, self.height) - dy
+                dx = rng.randint(0, 3)
+                dy = rng.randint(0, 3)
+                width = rng.randint(self.width - 3, self.width) - dx
+                height = rng.randint(self.height - 3, self.height) - dy
                 self.room = Rect(self.x + dx, self.y + dy, width, height)
 
+    def internal_nodes(self):
+        """
+        Yield every node that has children, children before their parent
+        """
+        if self.children:
+            for leaf in self.children:
+                yield from leaf.internal_nodes()
+            yield self
+
     def get_rooms(self, rooms_list):
         """
         :param list rooms_list:
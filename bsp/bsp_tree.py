@@ -0,0 +1,153 @@
+import random
+
+from bsp.bsp_leaf import Leaf
+from game_map.rect import Rect
+
+
+class BSPTree:
+    """
+    A Binary Spanning Tree kept in flat arrays, one slot per node.
+    Splitting and traversal use an explicit stack instead of recursion and
+    visit nodes in the same order as Leaf, so the same random numbers give
+    the same tree.
+    The two children of a node are always stored next to each other;
+    first_child holds the index of the first one, or -1 for a leaf.
+    """
+    def __init__(self, x, y, width, height, min_leaf_size=None):
+        """
+        :param int x: left edge of the root node
+        :param int y: top edge of the root node
+        :param int width: width of the root node
+        :param int height: height of the root node
+        :param int min_leaf_size: defaults to Leaf.MIN_LEAF_SIZE
+        """
+        self.min_leaf_size = Leaf.MIN_LEAF_SIZE if min_leaf_size is None else min_leaf_size
+        self.x = [x]
+        self.y = [y]
+        self.width = [width]
+        self.height = [height]
+        self.first_child = [-1]
+        self.room = [None]
+        # Corridors recorded on split nodes, by node index
+        self.corridors = {}
+
+    def __len__(self):
+        return len(self.x)
+
+    def _add_node(self, x, y, width, height):
+        self.x.append(x)
+        self.y.append(y)
+        self.width.append(width)
+        self.height.append(height)
+        self.first_child.append(-1)
+        self.room.append(None)
+
+    def _split_node(self, node, rng):
+        """
+        Attempt to divide a node into 2 smaller nodes, as Leaf.split does
+        :return bool: False if the node cannot be split
+        """
+        width, height = self.width[node], self.height[node]
+        if width > 1.25 * height:
+            split_horizontal = False
+        elif height > 1.25 * width:
+            split_horizontal = True
+        else:
+            split_horizontal = rng.random() < 0.5
+
+        if split_horizontal:
+            split_max = height - self.min_leaf_size
+        else:
+            split_max = width - self.min_leaf_size
+
+        if split_max < self.min_leaf_size:
+            return False
+
+        split = rng.randint(self.min_leaf_size, split_max)
+
+        x, y = self.x[node], self.y[node]
+        self.first_child[node] = len(self.x)
+        if split_horizontal:
+            self._add_node(x, y, width, split)
+            self._add_node(x, y + split, width, height - split)
+        else:
+            self._add_node(x, y, split, height)
+            self._add_node(x + split, y, width - split, height)
+        return True
+
+    def split(self, rng=random):
+        """
+        Split the root, then every new node, until no node can be split
+        :param rng: random number generator, defaults to the random module
+        """
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if self._split_node(node, rng):
+                first = self.first_child[node]
+                # Second child is pushed first so the first is finished first
+                stack.append(first + 1)
+                stack.append(first)
+
+    def leaves(self, node=0):
+        """
+        Yield the leaf nodes below a node, first child first
+        :param int node: subtree to walk, defaults to the root
+        :return: generator of node indices
+        """
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            first = self.first_child[node]
+            if first == -1:
+                yield node
+            else:
+                stack.append(first + 1)
+                stack.append(first)
+
+    def internal_nodes(self):
+        """
+        Yield every node that has children, children before their parent,
+        in the same order as Leaf.internal_nodes
+        """
+        stack = [(0, False)]
+        while stack:
+            node, children_done = stack.pop()
+            first = self.first_child[node]
+            if first == -1:
+                continue
+            if children_done:
+                yield node
+            else:
+                stack.append((node, True))
+                stack.append((first + 1, False))
+                stack.append((first, False))
+
+    def generate_rooms(self, fill=False, rng=random):
+        """
+        Create a room within every leaf, as Leaf.generate_room does
+        :param bool fill: Room fills node completely
+        :param rng: random number generator, defaults to the random module
+        """
+        for leaf in self.leaves():
+            if fill:
+                if self.x[leaf] > 0:
+                    self.x[leaf] -= 1
+                    self.width[leaf] += 1
+                if self.y[leaf] > 0:
+                    self.y[leaf] -= 1
+                    self.height[leaf] += 1
+                self.room[leaf] = Rect(self.x[leaf], self.y[leaf],
+                                       self.width[leaf], self.height[leaf])
+            else:
+                dx = rng.randint(0, 3)
+                dy = rng.randint(0, 3)
+                width = rng.randint(self.width[leaf] - 3, self.width[leaf]) - dx
+                height = rng.randint(self.height[leaf] - 3, self.height[leaf]) - dy
+                self.room[leaf] = Rect(self.x[leaf] + dx, self.y[leaf] + dy, width, height)
+
+    def get_rooms(self, rooms_list):
+        """
+        :param list rooms_list: receives the room of every leaf
+        """
+        rooms_list.extend(self.room[leaf] for leaf in self.leaves())
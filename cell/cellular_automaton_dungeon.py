@@ -1,4 +1,17 @@
-from random import randint
+import random
+from collections import deque
+from functools import partial
+
+from cell.regions import connect_regions, cull_regions, label_regions
+from cell.tiled_ca import run_tiled
+from game_map.instrumentation import timed_phase
+from game_map.map_file import KIND_CA_MAP, register_map_kind
+from game_map.render import RowRenderer, check_band, join_bands
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class CAMap:
@@ -20,15 +33,42 @@ class CAMap:
         self.height = height
         self.tiles = None
 
-    def reset_map(self, live_chance=50):
+    def clear_map(self, alive=False):
+        """
+        Set every cell to the same state, without drawing random numbers
+        :param bool alive: state for every cell
+        """
+        self.tiles = [[alive] * self.height for _ in range(self.width)]
+
+    def reset_map(self, live_chance=50, rng=random):
         """
         Clear the CA Map
         :param int  live_chance: 0-100, likelihood that the cell is alive
+        :param rng: random number generator, defaults to the random module.
+            A numpy Generator fills the whole grid with one vectorized draw.
         """
-        self.tiles = [
-            [(randint(1,100) <= live_chance)
-             for _ in range(self.height)]
-            for _ in range(self.width)]
+        if hasattr(rng, "integers"):
+            draws = rng.integers(1, 101, size=(self.width, self.height))
+            self.tiles = (draws <= live_chance).tolist()
+        elif rng is random or type(rng) is random.Random:
+            # Same draws as randint(1, 100) without its per-call overhead:
+            # randint takes 7 random bits and rejects values of 100 or more
+            getrandbits = rng.getrandbits
+            tiles = []
+            for _ in range(self.width):
+                column = []
+                for _ in range(self.height):
+                    draw = getrandbits(7)
+                    while draw >= 100:
+                        draw = getrandbits(7)
+                    column.append(draw < live_chance)
+                tiles.append(column)
+            self.tiles = tiles
+        else:
+            self.tiles = [
+                [(rng.randint(1,100) <= live_chance)
+                 for _ in range(self.height)]
+                for _ in range(self.width)]
 
     def point_in_map(self, x, y):
         """
@@ -39,6 +79,13 @@ class CAMap:
         """
         return 0 <= x < self.width and 0 <= y < self.height
 
+    def snapshot(self):
+        """
+        An immutable copy of the cells, for comparing states
+        :return tuple: tuple of column tuples
+        """
+        return tuple(map(tuple, self.tiles))
+
     def count_alive_neighbors(self, x, y, invalid=1):
         count = 0
         for dx, dy in CAMap.neighbors:
@@ -49,6 +96,55 @@ class CAMap:
                 count += 1
         return count
 
+    def iter_row_bytes(self, block_char="#", open_char="."):
+        """
+        Yield the rendered rows of the map, top to bottom, without newlines
+        :param block_char: symbol to represent a dead cell
+        :param open_char: symbol to represent a live cell
+        :return: generator of UTF-8 encoded rows
+        """
+        renderer = RowRenderer(block_char, open_char)
+        for row in zip(*self.tiles):
+            yield renderer.row_bytes(bytes(row))
+
+    def iter_rows(self, block_char="#", open_char="."):
+        """
+        Yield the rendered rows of the map, top to bottom, without newlines
+        :param block_char: symbol to represent a dead cell
+        :param open_char: symbol to represent a live cell
+        :return: generator of str rows
+        """
+        renderer = RowRenderer(block_char, open_char)
+        for row in zip(*self.tiles):
+            yield renderer.row_text(bytes(row))
+
+    def iter_bands(self, band=64, block_char="#", open_char="."):
+        """
+        Yield the rendered map a band of rows at a time, for writing a map
+        out without building its whole text
+        :param int band: most rows per band
+        :param block_char: symbol to represent a dead cell
+        :param open_char: symbol to represent a live cell
+        :return: generator of str, every row newline-terminated
+        """
+        return join_bands(self.iter_rows(block_char, open_char), band, "\n")
+
+    def iter_band_bytes(self, band=64, block_char="#", open_char="."):
+        """
+        Same as iter_bands, UTF-8 encoded
+        :return: generator of bytes, every row newline-terminated
+        """
+        return join_bands(self.iter_row_bytes(block_char, open_char), band, b"\n")
+
+    def printable_bytes(self, block_char="#", open_char="."):
+        """
+        Produce an encoded representation of the current CA Map
+        :param block_char: symbol to represent a dead cell
+        :param open_char: symbol to represent a live cell
+        :return bytes: UTF-8 text, one newline-terminated line per row
+        """
+        return b"".join(self.iter_band_bytes(max(self.height, 1), block_char, open_char))
+
     def printable_map(self, block_char="#", open_char="."):
         """
         Produce a string representation of the current Game Map
@@ -56,16 +152,24 @@ class CAMap:
         :param open_char: symbol to represent a see-through tile
         :return str: Printable Representation of the Game Map
         """
-        output = ""
-        for y in range(0, self.height):
-            line = ""
-            for x in range(0, self.width):
-                if not self.tiles[x][y]:
-                    line += block_char
-                else:
-                    line += open_char
-            output += line + "\n"
-        return output
+        return "".join(self.iter_bands(max(self.height, 1), block_char, open_char))
+
+
+def _ca_map_planes(ca_map):
+    """
+    :return list: the live cells as one row-major plane of 0/1 bytes
+    """
+    return [b"".join(bytes(row) for row in zip(*ca_map.tiles))]
+
+
+def _ca_map_from_planes(width, height, plane):
+    ca_map = CAMap(width, height)
+    cells = plane(0)
+    ca_map.tiles = [[cell == 1 for cell in cells[x::width]] for x in range(width)]
+    return ca_map
+
+
+register_map_kind(KIND_CA_MAP, CAMap, _ca_map_planes, _ca_map_from_planes)
 
 
 class CADungeon:
@@ -80,30 +184,304 @@ class CADungeon:
     """
 
     def __init__(self, width, height, initial_live_chance=50,
-                 death_limit=1, birth_limit=3):
+                 death_limit=1, birth_limit=3, invalid=1, backend="python",
+                 in_place=False, rng=None, stats=None):
+        """
+        :param int width: Map width in tiles
+        :param int height: Map height in tiles
+        :param int initial_live_chance: 0-100, likelihood that a cell starts alive
+        :param int death_limit: live cells with this many neighbors or fewer die
+        :param int birth_limit: dead cells with more neighbors than this come alive
+        :param int invalid: value counted for neighbors outside the map
+        :param str backend: "python", "incremental" (only re-evaluates cells
+            whose neighborhood changed in the last step) or "numpy"
+            (vectorized, needs numpy)
+        :param bool in_place: update the grid while it is being read.
+            This is the original, scan-order dependent behaviour; it is kept
+            so that existing seeds reproduce. Otherwise each step reads one
+            buffer and writes the other.
+        :param rng: random number generator for the initial scatter, e.g.
+            random.Random(seed) or a numpy Generator; defaults to the
+            random module
+        :param GenerationStats stats: optional, collects step timings and
+            the number of cells changed by each step
+        """
+        if backend not in ("python", "incremental", "numpy"):
+            raise ValueError("Unknown CA backend: {}".format(backend))
+        if backend == "numpy" and numpy is None:
+            raise ImportError("The numpy backend requires numpy to be installed")
+        if backend != "python" and in_place:
+            raise ValueError("The {} backend only supports synchronous updates".format(backend))
         self.width = width
         self.height = height
         self.initial_live_chance = initial_live_chance
         self.death_limit = death_limit
         self.birth_limit = birth_limit
+        self.invalid = invalid
+        self.backend = backend
+        self.in_place = in_place
+        self.rng = rng if rng is not None else random
+        self.stats = stats
         self.current_map = CAMap(width, height)
-        self.new_map = self.current_map
-        self.current_map.reset_map(initial_live_chance)
+        if in_place:
+            self.new_map = self.current_map
+        else:
+            self.new_map = CAMap(width, height)
+            self.new_map.clear_map()
+        self.current_map.reset_map(initial_live_chance, self.rng)
+        self.steps_run = 0
+        # Cells to re-evaluate on the next incremental step, None for all
+        self.active_cells = None
+
+    def generate(self, steps=1, stop_early=True, max_period=2):
+        """
+        Reset the map and grow the automaton.
+        Stops as soon as the grid stops changing or starts repeating with a
+        period of up to max_period steps. When it repeats, the remaining
+        steps are skipped but the phase is kept, so the result is the same as
+        running every step.
+        :param int steps: maximum number of iterations to run
+        :param bool stop_early: detect fixed points and cycles
+        :param int max_period: longest cycle to look for
+        :return int: number of steps actually run
+        """
+        self.current_map.reset_map(self.initial_live_chance, self.rng)
+        self.active_cells = None
+        if self.backend == "numpy":
+            grid = numpy.array(self.current_map.tiles, dtype=bool)
+            next_grid = self._numpy_stepper()
+
+            def advance():
+                nonlocal grid
+                new_grid = next_grid(grid)
+                changed = int(numpy.count_nonzero(new_grid != grid))
+                grid = new_grid
+                return changed
 
-    def generate(self, steps=1):
-        self.current_map.reset_map(self.initial_live_chance)
-        for s in range(0,steps):
-            self.step()
+            if self.stats is not None:
+                advance = partial(self._timed_step, advance)
+            self.steps_run = self._run_steps(steps, advance, lambda: grid.tobytes(),
+                                             stop_early, max_period)
+            self.current_map.tiles = grid.tolist()
+        else:
+            self.steps_run = self._run_steps(steps, self.step, self.current_map.snapshot,
+                                             stop_early, max_period)
+        return self.steps_run
+
+    def stream(self, steps=1, band=64, block_char="#", open_char=".", stop_early=True):
+        """
+        Generate the cave, then yield it rendered a band of rows at a time.
+        No row is final before the last step, but the text of the map is
+        never held in full.
+        :param int steps: maximum number of iterations to run
+        :param int band: most rows per band
+        :param block_char: symbol to represent a dead cell
+        :param open_char: symbol to represent a live cell
+        :param bool stop_early: see generate
+        :return: generator of str, every row newline-terminated
+        """
+        check_band(band)
+        return self._stream(steps, band, block_char, open_char, stop_early)
+
+    def _stream(self, steps, band, block_char, open_char, stop_early):
+        self.generate(steps, stop_early)
+        yield from self.current_map.iter_bands(band, block_char, open_char)
+
+    @staticmethod
+    def _run_steps(steps, advance, state, stop_early, max_period):
+        """
+        Call advance up to steps times, stopping early on a fixed point or cycle
+        :param int steps: maximum number of iterations
+        :param advance: runs one step, returns the number of changed cells
+        :param state: returns a comparable snapshot of the current grid
+        :param bool stop_early: detect fixed points and cycles
+        :param int max_period: longest cycle to look for
+        :return int: number of steps run
+        """
+        track_cycles = stop_early and max_period > 1
+        history = deque([state()] if track_cycles else (), maxlen=max_period)
+        ran = 0
+        while ran < steps:
+            changed = advance()
+            ran += 1
+            if not stop_early:
+                continue
+            if changed == 0:
+                break
+            if track_cycles:
+                current = state()
+                for period in range(2, len(history) + 1):
+                    if history[-period] == current:
+                        # Land on the same phase the full run would end on
+                        for _ in range((steps - ran) % period):
+                            advance()
+                            ran += 1
+                        return ran
+                history.append(current)
+        return ran
+
+    @timed_phase("ca_tiled")
+    def generate_tiled(self, steps=1, workers=None):
+        """
+        Same as generate, but the steps are split into strips computed by
+        a group of worker processes. Intended for very large caves.
+        With stats, the whole run is one phase and the steps are counted;
+        cells changed per step are not known here.
+        :param int steps: number of iterations to run
+        :param int workers: number of processes, defaults to the CPU count
+        :return int: number of steps run, always steps as there is no early stop
+        """
+        if self.in_place:
+            raise ValueError("Tiled generation only supports synchronous updates")
+        self.current_map.reset_map(self.initial_live_chance, self.rng)
+        self.active_cells = None
+        run_tiled(self, steps, workers)
+        self.steps_run = steps
+        if self.stats is not None:
+            self.stats.count("ca_steps", steps)
+        return self.steps_run
 
     def step(self):
+        """
+        Run one iteration of the automaton
+        :return int: number of cells that changed state
+        """
+        if self.stats is None:
+            return self._step()
+        return self._timed_step(self._step)
+
+    def _timed_step(self, advance):
+        """
+        Run one step through advance, recording its time and changed cells
+        """
+        with self.stats.phase("ca_step"):
+            changed = advance()
+        self.stats.record("cells_changed", changed)
+        return changed
+
+    def _step(self):
+        if self.backend == "numpy":
+            grid = numpy.array(self.current_map.tiles, dtype=bool)
+            new_grid = self._numpy_stepper()(grid)
+            self.current_map.tiles = new_grid.tolist()
+            return int(numpy.count_nonzero(new_grid != grid))
+        if self.backend == "incremental":
+            return self._step_incremental()
+        changed = 0
         for y in range(0, self.current_map.height):
             for x in range(0, self.current_map.width):
-                neighbors = self.current_map.count_alive_neighbors(x, y)
-                if self.current_map.tiles[x][y]:
-                    self.new_map.tiles[x][y] = not (neighbors <= self.death_limit)
+                neighbors = self.current_map.count_alive_neighbors(x, y, self.invalid)
+                alive = self.current_map.tiles[x][y]
+                if alive:
+                    new_state = not (neighbors <= self.death_limit)
                 else:
-                    self.new_map.tiles[x][y] = (neighbors > self.birth_limit)
-        self.current_map = self.new_map
+                    new_state = (neighbors > self.birth_limit)
+                if new_state != alive:
+                    changed += 1
+                self.new_map.tiles[x][y] = new_state
+        # Swap buffers; in place mode they are the same map
+        self.current_map, self.new_map = self.new_map, self.current_map
+        return changed
+
+    def _step_incremental(self):
+        """
+        Run one iteration, only evaluating active cells.
+        A cell whose neighborhood did not change in the last step keeps its
+        state, and still holds the same state in the back buffer, so it can
+        be skipped. The first step after a reset evaluates every cell.
+        :return int: number of cells that changed state
+        """
+        current, new = self.current_map, self.new_map
+        if self.active_cells is None:
+            cells = [(x, y) for x in range(self.width) for y in range(self.height)]
+        else:
+            cells = self.active_cells
+        changed = []
+        for x, y in cells:
+            neighbors = current.count_alive_neighbors(x, y, self.invalid)
+            alive = current.tiles[x][y]
+            if alive:
+                new_state = not (neighbors <= self.death_limit)
+            else:
+                new_state = (neighbors > self.birth_limit)
+            new.tiles[x][y] = new_state
+            if new_state != alive:
+                changed.append((x, y))
+
+        active = set()
+        for x, y in changed:
+            active.add((x, y))
+            for dx, dy in CAMap.neighbors:
+                tx, ty = x + dx, y + dy
+                if current.point_in_map(tx, ty):
+                    active.add((tx, ty))
+        self.active_cells = active
+        self.current_map, self.new_map = new, current
+        return len(changed)
+
+    def _numpy_stepper(self):
+        """
+        Build a function computing one step on a whole numpy grid.
+        Neighbor counts are sums of the eight shifted views of a zero-padded
+        grid; neighbors outside the map add the invalid value, as in
+        CAMap.count_alive_neighbors.
+        :return: function mapping a (width, height) bool array to the next one
+        """
+        width, height = self.width, self.height
+
+        def neighbor_sum(padded):
+            total = numpy.zeros((width, height), dtype=numpy.int16)
+            for dx, dy in CAMap.neighbors:
+                total += padded[1 + dx:width + 1 + dx, 1 + dy:height + 1 + dy]
+            return total
+
+        outside = numpy.ones((width + 2, height + 2), dtype=numpy.int16)
+        outside[1:-1, 1:-1] = 0
+        edge_counts = neighbor_sum(outside) * self.invalid
+        padded = numpy.zeros((width + 2, height + 2), dtype=numpy.int16)
+
+        def next_grid(grid):
+            padded[1:-1, 1:-1] = grid
+            counts = neighbor_sum(padded) + edge_counts
+            return numpy.where(grid, counts > self.death_limit, counts > self.birth_limit)
+
+        return next_grid
+
+    def set_tiles(self, tiles):
+        """
+        Replace the live cells, e.g. with noise drawn elsewhere
+        :param list tiles: tiles[x][y] of bools, width x height
+        """
+        self.current_map.tiles = tiles
+        self.active_cells = None
+
+    def find_regions(self):
+        """
+        Locate the unconnected open regions of the current map
+        :return list, list: flat labels (x * height + y, -1 for walls), region sizes
+        """
+        return label_regions(self.current_map)
+
+    def cull_regions(self, min_size):
+        """
+        Fill in open regions smaller than min_size cells
+        :param int min_size: smallest region to keep
+        :return int: number of regions removed
+        """
+        # Cells changed outside step: the next incremental step rescans all
+        self.active_cells = None
+        return cull_regions(self.current_map, min_size)
+
+    def connect_regions(self, min_size=0):
+        """
+        Join every open region to the others with the shortest tunnels
+        :param int min_size: regions smaller than this are culled first
+        :return int: number of cells dug out
+        """
+        if min_size:
+            self.cull_regions(min_size)
+        self.active_cells = None
+        return connect_regions(self.current_map)
 
     def __repr__(self):
         return self.current_map.printable_map()
@@ -112,4 +490,5 @@ class CADungeon:
 if __name__ == "__main__":
     dungeon = CADungeon(80, 25, 33, 1, 4)
     dungeon.generate(50)
+    dungeon.connect_regions(min_size=4)
     print(dungeon)
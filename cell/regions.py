@@ -0,0 +1,146 @@
+"""
+Connected regions of a CAMap.
+
+Live cells are open floor. Regions are groups of live cells joined through
+their four orthogonal neighbors. Everything here works on flat lists indexed
+by x * height + y and uses explicit queues, so large caves cannot hit the
+recursion limit.
+"""
+from collections import deque
+
+
+def _orthogonal(index, width, height):
+    """
+    Flat indices of the in-map orthogonal neighbors of a cell
+    """
+    x, y = divmod(index, height)
+    if x > 0:
+        yield index - height
+    if x < width - 1:
+        yield index + height
+    if y > 0:
+        yield index - 1
+    if y < height - 1:
+        yield index + 1
+
+
+def label_regions(ca_map):
+    """
+    Label each connected region of live cells
+    :param CAMap ca_map: map to label
+    :return list, list: flat labels (-1 for dead cells), size of each region
+    """
+    width, height = ca_map.width, ca_map.height
+    cells = [cell for column in ca_map.tiles for cell in column]
+    labels = [-1] * (width * height)
+    sizes = []
+    queue = deque()
+    for start, alive in enumerate(cells):
+        if not alive or labels[start] != -1:
+            continue
+        label = len(sizes)
+        labels[start] = label
+        queue.append(start)
+        size = 0
+        while queue:
+            index = queue.popleft()
+            size += 1
+            for neighbor in _orthogonal(index, width, height):
+                if cells[neighbor] and labels[neighbor] == -1:
+                    labels[neighbor] = label
+                    queue.append(neighbor)
+        sizes.append(size)
+    return labels, sizes
+
+
+def cull_regions(ca_map, min_size):
+    """
+    Kill every region smaller than min_size cells
+    :param CAMap ca_map: map to edit
+    :param int min_size: smallest region to keep
+    :return int: number of regions removed
+    """
+    labels, sizes = label_regions(ca_map)
+    small = {label for label, size in enumerate(sizes) if size < min_size}
+    if small:
+        height = ca_map.height
+        for index, label in enumerate(labels):
+            if label in small:
+                x, y = divmod(index, height)
+                ca_map.tiles[x][y] = False
+    return len(small)
+
+
+class _DisjointSet:
+    """
+    Union-find over region labels
+    """
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, item):
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return False
+        self.parent[root_b] = root_a
+        return True
+
+
+def connect_regions(ca_map):
+    """
+    Dig the shortest set of tunnels that joins every region.
+    A breadth-first search grows out of all regions at once; where two
+    fronts meet, the cells walked back to each region form a candidate
+    tunnel. The cheapest candidates that join separate regions are dug,
+    as in a minimum spanning tree.
+    :param CAMap ca_map: map to edit
+    :return int: number of cells dug out
+    """
+    width, height = ca_map.width, ca_map.height
+    labels, sizes = label_regions(ca_map)
+    if len(sizes) < 2:
+        return 0
+
+    owner = labels[:]
+    distance = [0] * (width * height)
+    parent = [-1] * (width * height)
+    queue = deque(index for index, label in enumerate(labels) if label != -1)
+    # Cheapest meeting point for each pair of regions
+    best = {}
+    while queue:
+        index = queue.popleft()
+        region = owner[index]
+        for neighbor in _orthogonal(index, width, height):
+            other = owner[neighbor]
+            if other == -1:
+                owner[neighbor] = region
+                distance[neighbor] = distance[index] + 1
+                parent[neighbor] = index
+                queue.append(neighbor)
+            elif other != region:
+                cost = distance[index] + distance[neighbor]
+                key = (min(region, other), max(region, other))
+                if key not in best or cost < best[key][0]:
+                    best[key] = (cost, index, neighbor)
+
+    regions = _DisjointSet(len(sizes))
+    dug = 0
+    for (a, b), (cost, start, end) in sorted(best.items(), key=lambda item: item[1]):
+        if not regions.union(a, b):
+            continue
+        for index in (start, end):
+            while distance[index] > 0:
+                x, y = divmod(index, height)
+                if not ca_map.tiles[x][y]:
+                    ca_map.tiles[x][y] = True
+                    dug += 1
+                index = parent[index]
+    return dug
@@ -0,0 +1,149 @@
+"""
+Run CADungeon steps across several processes.
+
+The grid is split into vertical strips, one per worker process. Two grids
+live in shared memory (column-major, one byte per cell, like CAMap.tiles[x][y])
+and every step reads one and writes the other. A worker reads its strip plus a
+one-column halo from its neighbors directly out of the shared grid, so halos
+are exchanged through shared memory instead of pickling grids between
+processes. A barrier keeps the workers in lockstep between steps.
+"""
+from multiprocessing import Barrier, Process, cpu_count
+from multiprocessing.shared_memory import SharedMemory
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def split_strips(width, workers):
+    """
+    Divide the columns of a map between workers
+    :param int width: number of columns
+    :param int workers: number of strips wanted
+    :return list: (x_start, x_end) pairs covering range(width)
+    """
+    workers = max(1, min(workers, width))
+    base, extra = divmod(width, workers)
+    strips = []
+    x = 0
+    for i in range(workers):
+        strip_width = base + (1 if i < extra else 0)
+        strips.append((x, x + strip_width))
+        x += strip_width
+    return strips
+
+
+def step_strip(src, dst, width, height, x_start, x_end,
+               death_limit, birth_limit, invalid):
+    """
+    Compute one synchronous CA step for the columns x_start..x_end-1
+    :param src: buffer holding the current grid
+    :param dst: buffer receiving the new grid
+    """
+    edge = bytes([invalid])
+    outside = edge * (height + 2)
+
+    def column(x):
+        if 0 <= x < width:
+            return edge + bytes(src[x * height:(x + 1) * height]) + edge
+        return outside
+
+    left, centre = column(x_start - 1), column(x_start)
+    for x in range(x_start, x_end):
+        right = column(x + 1)
+        out = bytearray(height)
+        for y in range(height):
+            neighbors = (left[y] + left[y + 1] + left[y + 2] +
+                         centre[y] + centre[y + 2] +
+                         right[y] + right[y + 1] + right[y + 2])
+            if centre[y + 1]:
+                out[y] = neighbors > death_limit
+            else:
+                out[y] = neighbors > birth_limit
+        dst[x * height:(x + 1) * height] = out
+        left, centre = centre, right
+
+
+def step_strip_numpy(src, dst, width, height, x_start, x_end,
+                     death_limit, birth_limit, invalid):
+    """
+    Vectorized version of step_strip
+    """
+    grid = numpy.frombuffer(src, dtype=numpy.uint8, count=width * height).reshape(width, height)
+    out = numpy.frombuffer(dst, dtype=numpy.uint8, count=width * height).reshape(width, height)
+    # Columns of the strip and its halo that exist on the map
+    lo, hi = max(x_start - 1, 0), min(x_end + 1, width)
+    padded = numpy.full((hi - lo + 2, height + 2), invalid, dtype=numpy.int16)
+    padded[1:-1, 1:-1] = grid[lo:hi]
+    # Rows of padded corresponding to the strip itself
+    first = x_start - lo + 1
+    count = x_end - x_start
+    neighbors = numpy.zeros((count, height), dtype=numpy.int16)
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            if dx or dy:
+                neighbors += padded[first + dx:first + dx + count, 1 + dy:height + 1 + dy]
+    alive = grid[x_start:x_end] != 0
+    out[x_start:x_end] = numpy.where(alive, neighbors > death_limit, neighbors > birth_limit)
+
+
+def _worker(names, width, height, x_start, x_end, steps,
+            death_limit, birth_limit, invalid, use_numpy, barrier):
+    buffers = [SharedMemory(name=name) for name in names]
+    step = step_strip_numpy if use_numpy else step_strip
+    try:
+        for s in range(steps):
+            src, dst = buffers[s % 2].buf, buffers[(s + 1) % 2].buf
+            step(src, dst, width, height, x_start, x_end,
+                 death_limit, birth_limit, invalid)
+            barrier.wait()
+    except Exception:
+        # Release the other workers instead of leaving them at the barrier
+        barrier.abort()
+        raise
+    finally:
+        for shm in buffers:
+            shm.close()
+
+
+def run_tiled(dungeon, steps, workers=None):
+    """
+    Step a CADungeon's current map in several processes.
+    The result matches calling dungeon.step() the same number of times.
+    :param CADungeon dungeon: dungeon whose current_map is stepped
+    :param int steps: number of iterations to run
+    :param int workers: number of processes, defaults to the CPU count
+    """
+    width, height = dungeon.width, dungeon.height
+    strips = split_strips(width, workers or cpu_count())
+    size = width * height
+    buffers = [SharedMemory(create=True, size=max(size, 1)) for _ in range(2)]
+    try:
+        buffers[0].buf[:size] = bytes(
+            cell for column in dungeon.current_map.tiles for cell in column)
+        barrier = Barrier(len(strips))
+        names = [shm.name for shm in buffers]
+        use_numpy = dungeon.backend == "numpy"
+        processes = [
+            Process(target=_worker,
+                    args=(names, width, height, x_start, x_end, steps,
+                          dungeon.death_limit, dungeon.birth_limit,
+                          dungeon.invalid, use_numpy, barrier))
+            for x_start, x_end in strips]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        if any(process.exitcode for process in processes):
+            raise RuntimeError("A CA worker process failed")
+
+        result = bytes(buffers[steps % 2].buf[:size])
+        dungeon.current_map.tiles = [
+            [cell == 1 for cell in result[x * height:(x + 1) * height]]
+            for x in range(width)]
+    finally:
+        for shm in buffers:
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,367 @@
+"""
+Unbounded maps made of fixed-size chunks generated on first access.
+
+Every chunk is a chunk_size x chunk_size GameMap. Its content only depends
+on the world seed and the chunk coordinates, so a chunk can be thrown away
+and generated again at any time, in any order, and come out the same.
+Resident chunks are kept in an LRU cache; evicted chunks are written out in
+the map_file format and read back instead of being generated again, which
+also keeps any edits made to them, through set_tile or directly on the
+chunk's GameMap. Chunks in a caller supplied cache_dir outlive the
+ChunkedMap: a later one on the same directory reads them back.
+
+Chunk generators:
+    CaveChunks  cellular automaton caves. The noise is a function of world
+                coordinates and each chunk is grown with a margin as wide as
+                the number of steps, so the caves run across chunk borders
+                without a seam.
+    BSPChunks   a BSPDungeon per chunk. Each chunk border has a door at a
+                position both neighbors derive from the seed, and both
+                chunks dig a corridor to it.
+"""
+import hashlib
+import os
+import random
+import struct
+import tempfile
+from collections import OrderedDict
+from functools import partial
+
+from bsp.bsp_dungeon import BSPDungeon
+from cell.cellular_automaton_dungeon import CADungeon, CAMap
+from game_map.game_map import GameMap
+from game_map.map_file import EXTENSION, load_map, save_map
+
+# Swap 0 and 1, to turn live CA cells into open tiles
+_INVERT = bytes.maketrans(b"\x00\x01", b"\x01\x00")
+
+
+def chunk_seed(seed, *coords):
+    """
+    Stable seed for a chunk, or anything else keyed by integer coordinates.
+    Unlike hash(), the value does not change between runs or processes.
+    :param int seed: world seed
+    :param int coords: chunk coordinates, may be negative
+    :return int: 64 bit seed
+    """
+    data = struct.pack("<{}q".format(len(coords) + 1), seed, *coords)
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+class CaveChunks:
+    """
+    Generate chunks with CADungeon
+    """
+    def __init__(self, seed, steps=4, initial_live_chance=45,
+                 death_limit=1, birth_limit=4, invalid=1, backend="python"):
+        """
+        :param int seed: world seed
+        :param int steps: iterations of the automaton
+        :param int initial_live_chance: 0-100, likelihood that a cell starts alive
+        :param int death_limit: see CADungeon
+        :param int birth_limit: see CADungeon
+        :param int invalid: see CADungeon; only reaches the margin, never the chunk
+        :param str backend: CADungeon backend
+        """
+        self.seed = seed
+        self.steps = steps
+        self.initial_live_chance = initial_live_chance
+        self.death_limit = death_limit
+        self.birth_limit = birth_limit
+        self.invalid = invalid
+        self.backend = backend
+        self.dungeon = None
+        # Noise of recently used chunks; neighbors share most of it
+        self.noise_cache = OrderedDict()
+        self.noise_cache_size = 16
+
+    def _noise(self, cx, cy, size):
+        """
+        :return list: the initial live cells of a chunk, tiles[x][y]
+        """
+        key = (cx, cy, size)
+        tiles = self.noise_cache.get(key)
+        if tiles is None:
+            noise = CAMap(size, size)
+            noise.reset_map(self.initial_live_chance,
+                            random.Random(chunk_seed(self.seed, cx, cy)))
+            tiles = noise.tiles
+            self.noise_cache[key] = tiles
+            if len(self.noise_cache) > self.noise_cache_size:
+                self.noise_cache.popitem(last=False)
+        else:
+            self.noise_cache.move_to_end(key)
+        return tiles
+
+    def generate(self, cx, cy, size):
+        """
+        :param int cx: chunk X coordinate
+        :param int cy: chunk Y coordinate
+        :param int size: chunk width and height in tiles
+        :return GameMap:
+        """
+        margin = self.steps
+        if margin > size:
+            raise ValueError("CaveChunks needs chunks at least as large as the step count")
+        # The chunk plus a margin on every side, taken from the neighbors' noise
+        padded = []
+        for dx in (-1, 0, 1):
+            columns = [self._noise(cx + dx, cy + dy, size) for dy in (-1, 0, 1)]
+            for x in range(size):
+                column = columns[0][x] + columns[1][x] + columns[2][x]
+                padded.append(column[size - margin:2 * size + margin])
+        padded = padded[size - margin:2 * size + margin]
+
+        padded_size = size + 2 * margin
+        if self.dungeon is None or self.dungeon.width != padded_size:
+            self.dungeon = CADungeon(padded_size, padded_size, self.initial_live_chance,
+                                     self.death_limit, self.birth_limit, self.invalid,
+                                     self.backend, rng=random.Random(self.seed))
+        dungeon = self.dungeon
+        dungeon.set_tiles(padded)
+        for _ in range(self.steps):
+            dungeon.step()
+
+        inner = [column[margin:margin + size]
+                 for column in dungeon.current_map.tiles[margin:margin + size]]
+        plane = b"".join(bytes(row) for row in zip(*inner)).translate(_INVERT)
+        game_map = GameMap(size, size)
+        game_map.clear_map()
+        game_map.block_move_plane[:] = plane
+        game_map.block_sight_plane[:] = plane
+        return game_map
+
+
+class BSPChunks:
+    """
+    Generate chunks with BSPDungeon, joined through doors on the chunk borders
+    """
+    def __init__(self, seed, fill=False, corridors="tree", engine="leaf"):
+        """
+        :param int seed: world seed
+        :param bool fill: see BSPDungeon.generate
+        :param str corridors: see BSPDungeon.generate
+        :param str engine: see BSPDungeon
+        """
+        self.seed = seed
+        self.fill = fill
+        self.corridors = corridors
+        self.engine = engine
+
+    def _door(self, cx, cy, axis, size):
+        """
+        Position of the door on the east (axis 0) or south (axis 1) border
+        of a chunk, away from the corners
+        """
+        return 1 + chunk_seed(self.seed, cx, cy, axis) % max(size - 2, 1)
+
+    def generate(self, cx, cy, size):
+        """
+        :param int cx: chunk X coordinate
+        :param int cy: chunk Y coordinate
+        :param int size: chunk width and height in tiles
+        :return GameMap:
+        """
+        game_map = GameMap(size, size)
+        dungeon = BSPDungeon(game_map, random.Random(chunk_seed(self.seed, cx, cy)),
+                             self.engine)
+        dungeon.generate(self.fill, self.corridors)
+        last = size - 1
+        doors = [
+            (last, self._door(cx, cy, 0, size)),
+            (0, self._door(cx - 1, cy, 0, size)),
+            (self._door(cx, cy, 1, size), last),
+            (self._door(cx, cy - 1, 1, size), 0),
+        ]
+        rooms = [room.center() for room in dungeon.rooms_list] or [(size // 2, size // 2)]
+        for door_x, door_y in doors:
+            room_x, room_y = min(rooms, key=lambda centre: abs(centre[0] - door_x) +
+                                 abs(centre[1] - door_y))
+            if door_x in (0, last):
+                game_map.create_h_tunnel(door_x, room_x, door_y)
+                game_map.create_v_tunnel(door_y, room_y, room_x)
+            else:
+                game_map.create_v_tunnel(door_y, room_y, door_x)
+                game_map.create_h_tunnel(door_x, room_x, room_y)
+        return game_map
+
+
+class ChunkedMap:
+    """
+    A map without fixed bounds, read and written in world coordinates.
+    Chunk (cx, cy) covers x in [cx * chunk_size, (cx + 1) * chunk_size),
+    and the same for y; coordinates may be negative.
+    """
+    def __init__(self, generator, chunk_size=64, cache_size=64, cache_dir=None):
+        """
+        :param generator: object with generate(cx, cy, size) returning a
+            GameMap, e.g. CaveChunks or BSPChunks
+        :param int chunk_size: width and height of a chunk in tiles
+        :param int cache_size: most chunks kept in memory at once
+        :param str cache_dir: directory for evicted chunks, kept by close()
+            and read back by later ChunkedMaps using it; defaults to a
+            temporary directory removed by close()
+        """
+        if cache_size < 1:
+            raise ValueError("cache_size must be at least 1")
+        self.generator = generator
+        self.chunk_size = chunk_size
+        self.cache_size = cache_size
+        self.cache_dir = cache_dir
+        # Chunks may already be on disk only in a caller supplied directory
+        self.persistent = cache_dir is not None
+        self.temp_dir = None
+        # Resident chunks by (cx, cy), least recently used first
+        self.chunks = OrderedDict()
+        # Change listener registered on each resident chunk
+        self.listeners = {}
+        # Resident chunks changed since they were generated or loaded
+        self.dirty = set()
+        # Chunks with an up to date copy on disk
+        self.saved = set()
+        self.generated = 0
+        self.loaded = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _chunk_path(self, cx, cy):
+        if self.cache_dir is None:
+            self.temp_dir = tempfile.TemporaryDirectory(prefix="chunks")
+            self.cache_dir = self.temp_dir.name
+        return os.path.join(self.cache_dir, "chunk_{}_{}{}".format(cx, cy, EXTENSION))
+
+    def chunk(self, cx, cy):
+        """
+        Get a chunk, loading or generating it if it is not resident
+        :param int cx: chunk X coordinate
+        :param int cy: chunk Y coordinate
+        :return GameMap:
+        """
+        key = (cx, cy)
+        game_map = self.chunks.get(key)
+        if game_map is not None:
+            self.chunks.move_to_end(key)
+            return game_map
+        if key in self.saved or (self.persistent and os.path.exists(self._chunk_path(cx, cy))):
+            game_map, _ = load_map(self._chunk_path(cx, cy))
+            self.saved.add(key)
+            self.loaded += 1
+        else:
+            game_map = self.generator.generate(cx, cy, self.chunk_size)
+            self.generated += 1
+        self.chunks[key] = game_map
+        self.listeners[key] = partial(self._chunk_changed, key)
+        game_map.add_change_listener(self.listeners[key])
+        while len(self.chunks) > self.cache_size:
+            self._evict()
+        return game_map
+
+    def _evict(self):
+        """
+        Drop the least recently used chunk, writing it out unless an up to
+        date copy is already on disk
+        """
+        (cx, cy), game_map = self.chunks.popitem(last=False)
+        game_map.remove_change_listener(self.listeners.pop((cx, cy)))
+        self._write_chunk(cx, cy, game_map)
+
+    def _chunk_changed(self, key, x1, y1, x2, y2):
+        """
+        Change listener of a resident chunk: its copy on disk is out of date
+        """
+        self.dirty.add(key)
+
+    def _write_chunk(self, cx, cy, game_map):
+        key = (cx, cy)
+        if key in self.dirty or key not in self.saved:
+            save_map(self._chunk_path(cx, cy), game_map)
+            self.saved.add(key)
+            self.dirty.discard(key)
+
+    def flush(self):
+        """
+        Write every resident chunk that has no up to date copy on disk
+        """
+        for (cx, cy), game_map in self.chunks.items():
+            self._write_chunk(cx, cy, game_map)
+
+    def close(self):
+        """
+        Drop every resident chunk and remove the temporary directory, if any.
+        Chunks in a caller supplied cache_dir are flushed and kept.
+        """
+        if self.temp_dir is not None:
+            self.temp_dir.cleanup()
+            self.temp_dir = None
+            self.cache_dir = None
+            self.saved.clear()
+        else:
+            self.flush()
+        for key, game_map in self.chunks.items():
+            game_map.remove_change_listener(self.listeners.pop(key))
+        self.chunks.clear()
+        self.dirty.clear()
+
+    def locate(self, x, y):
+        """
+        :param int x: world X position
+        :param int y: world Y position
+        :return GameMap, int: the chunk holding a tile, the tile's plane index in it
+        """
+        cx, local_x = divmod(x, self.chunk_size)
+        cy, local_y = divmod(y, self.chunk_size)
+        return self.chunk(cx, cy), local_y * self.chunk_size + local_x
+
+    def block_move(self, x, y):
+        game_map, index = self.locate(x, y)
+        return bool(game_map.block_move_plane[index])
+
+    def block_sight(self, x, y):
+        game_map, index = self.locate(x, y)
+        return bool(game_map.block_sight_plane[index])
+
+    def set_tile(self, x, y, block_state=False):
+        """
+        Set both movement and sight blocking for one tile
+        :param int x: world X position
+        :param int y: world Y position
+        :param bool block_state: True if the tile should be solid
+        """
+        size = self.chunk_size
+        cx, local_x = divmod(x, size)
+        cy, local_y = divmod(y, size)
+        self.chunk(cx, cy).set_tile(local_x, local_y, block_state)
+
+    def region(self, x, y, width, height):
+        """
+        Copy an area of the world into a GameMap, e.g. to render it
+        :param int x: world X position of the left edge
+        :param int y: world Y position of the top edge
+        :param int width: area width in tiles
+        :param int height: area height in tiles
+        :return GameMap:
+        """
+        size = self.chunk_size
+        area = GameMap(width, height)
+        area.clear_map()
+        for cy in range(y // size, (y + height - 1) // size + 1):
+            for cx in range(x // size, (x + width - 1) // size + 1):
+                chunk = self.chunk(cx, cy)
+                # Overlap of the area and the chunk, in world coordinates
+                x1, x2 = max(x, cx * size), min(x + width, (cx + 1) * size)
+                y1, y2 = max(y, cy * size), min(y + height, (cy + 1) * size)
+                for world_y in range(y1, y2):
+                    src = (world_y - cy * size) * size + x1 - cx * size
+                    dst = (world_y - y) * width + x1 - x
+                    area.block_move_plane[dst:dst + x2 - x1] = chunk.block_move_plane[src:src + x2 - x1]
+                    area.block_sight_plane[dst:dst + x2 - x1] = chunk.block_sight_plane[src:src + x2 - x1]
+        return area
+
+
+if __name__ == "__main__":
+    with ChunkedMap(CaveChunks(seed=1), chunk_size=32, cache_size=4) as world:
+        print(world.region(-40, -12, 80, 25).printable_map())
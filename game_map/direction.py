@@ -1,4 +1,4 @@
-from random import randint
+import random
 from enum import Enum
 
 
@@ -12,12 +12,13 @@ class Direction(Enum):
     LEFT = 3
 
     @staticmethod
-    def random_direction():
+    def random_direction(rng=random):
         """
         Pick a random direction
+        :param rng: random number generator, defaults to the random module
         :return Direction:
         """
-        return Direction(randint(0, 3))
+        return Direction(rng.randint(0, 3))
 
     @staticmethod
     def next_direction(direction):
@@ -0,0 +1,319 @@
+"""
+Distance fields ("Dijkstra maps") over the block_move plane of a GameMap.
+
+A field holds, for every tile, the number of 4-connected steps to the
+nearest of a set of source tiles, e.g. players or exits, as a uint16
+(UNREACHED where no source can be reached). DistanceLayers keeps any number
+of named fields for one map and updates them incrementally as sources move
+or tiles are carved: only the tiles whose distance can change are visited.
+
+Fields use a padded layout: index (y + 1) * stride + x, with stride =
+width + 1. The spare column and the spare rows above and below the map are
+always blocked, so a neighbor is just index +- 1 or +- stride with no
+bounds checks, as in OccupancyGrid.
+"""
+from array import array
+from collections import deque
+
+# Distance of tiles no source can reach
+UNREACHED = 0xFFFF
+
+
+class DistanceField:
+    """
+    Distances to the nearest of a set of sources, kept up to date by its DistanceLayers
+    """
+    def __init__(self, layers, sources):
+        """
+        :param DistanceLayers layers: owner, holding the map and blocked tiles
+        :param sources: iterable of (x, y) tiles
+        """
+        self.layers = layers
+        self.sources = set()
+        self.values = array("H", [UNREACHED]) * len(layers.blocked)
+        for x, y in sources:
+            self.sources.add(layers.index(x, y))
+
+    def compute(self):
+        """
+        Recompute every distance with a multi-source BFS
+        """
+        values, blocked = self.values, self.layers.blocked
+        values[:] = array("H", [UNREACHED]) * len(values)
+        seeds = []
+        for index in self.sources:
+            if not blocked[index]:
+                values[index] = 0
+                seeds.append((0, index))
+        self._spread(seeds)
+
+    def distance(self, x, y):
+        """
+        :return int: steps to the nearest source, or UNREACHED
+        """
+        return self.values[self.layers.index(x, y)]
+
+    def add_source(self, x, y):
+        index = self.layers.index(x, y)
+        self.sources.add(index)
+        if not self.layers.blocked[index] and self.values[index]:
+            self.values[index] = 0
+            self._spread([(0, index)])
+
+    def remove_source(self, x, y):
+        index = self.layers.index(x, y)
+        if index not in self.sources:
+            return
+        self.sources.discard(index)
+        if not self.layers.blocked[index]:
+            self._raise([index])
+
+    def move_source(self, old, new):
+        """
+        :param old: (x, y) of the source
+        :param new: (x, y) it moved to
+        """
+        # Adding first keeps the tiles now closer to the new spot from
+        # being cleared along with those of the old one
+        self.add_source(*new)
+        if tuple(new) != tuple(old):
+            self.remove_source(*old)
+
+    def _spread(self, seeds):
+        """
+        Lower distances outwards from some tiles whose value is already set.
+        Seeds are taken in order of distance, merged with the BFS queue, so
+        every tile is settled with its final value in one visit.
+        :param list seeds: (distance, index) pairs
+        """
+        values, blocked = self.values, self.layers.blocked
+        stride = self.layers.stride
+        offsets = (-1, 1, -stride, stride)
+        seeds.sort()
+        queue = deque()
+        next_seed = 0
+        while next_seed < len(seeds) or queue:
+            if queue and (next_seed == len(seeds) or queue[0][0] <= seeds[next_seed][0]):
+                distance, index = queue.popleft()
+            else:
+                distance, index = seeds[next_seed]
+                next_seed += 1
+            if distance > values[index]:
+                continue
+            distance += 1
+            if distance >= UNREACHED:
+                continue
+            for offset in offsets:
+                neighbor = index + offset
+                if not blocked[neighbor] and values[neighbor] > distance:
+                    values[neighbor] = distance
+                    queue.append((distance, neighbor))
+
+    def _raise(self, starts):
+        """
+        Recompute distances after some tiles lost their distance (a source
+        was removed or a tile was blocked). Every tile whose shortest path
+        could run through them is cleared, then filled back in from the
+        tiles around the cleared area. If that is a large part of the map,
+        it is cheaper to compute the whole field again.
+        :param list starts: indices whose old distance no longer holds
+        """
+        values, blocked = self.values, self.layers.blocked
+        stride = self.layers.stride
+        offsets = (-1, 1, -stride, stride)
+        affected = set()
+        queue = deque()
+        for index in starts:
+            if values[index] != UNREACHED and index not in affected:
+                affected.add(index)
+                queue.append(index)
+        limit = len(values) // 4
+        while queue:
+            if len(affected) > limit:
+                self.compute()
+                return
+            index = queue.popleft()
+            following = values[index] + 1
+            if following >= UNREACHED:
+                continue
+            for offset in offsets:
+                neighbor = index + offset
+                if values[neighbor] == following and neighbor not in affected:
+                    affected.add(neighbor)
+                    queue.append(neighbor)
+
+        for index in affected:
+            values[index] = UNREACHED
+        seeds = []
+        border = set()
+        for index in affected:
+            if index in self.sources and not blocked[index]:
+                values[index] = 0
+                seeds.append((0, index))
+            for offset in offsets:
+                neighbor = index + offset
+                if (neighbor not in affected and neighbor not in border and
+                        values[neighbor] != UNREACHED):
+                    border.add(neighbor)
+                    seeds.append((values[neighbor], neighbor))
+        self._spread(seeds)
+
+    def _opened(self, opened):
+        """
+        Give newly passable tiles a distance and spread it
+        :param list opened: indices no longer blocked
+        """
+        values, stride = self.values, self.layers.stride
+        seeds = []
+        for index in opened:
+            if index in self.sources:
+                values[index] = 0
+            else:
+                nearest = min(values[index - 1], values[index + 1],
+                              values[index - stride], values[index + stride])
+                if nearest == UNREACHED:
+                    continue
+                values[index] = min(nearest + 1, UNREACHED - 1)
+            seeds.append((values[index], index))
+        self._spread(seeds)
+
+    def _closed(self, closed):
+        """
+        Clear newly blocked tiles and everything that was reached through them
+        :param list closed: indices now blocked
+        """
+        self._raise(closed)
+
+
+class DistanceLayers:
+    """
+    Named distance fields for one GameMap, kept up to date as tiles change
+    through the map's methods or tiles
+    """
+    def __init__(self, game_map):
+        """
+        :param GameMap game_map: map to watch
+        """
+        self.game_map = game_map
+        self.width = game_map.width
+        self.height = game_map.height
+        self.stride = self.width + 1
+        self.fields = {}
+        # Padded copy of block_move_plane, also used to see what changed
+        self.blocked = bytearray([1]) * ((self.height + 2) * self.stride)
+        self._copy_rows(0, 0, self.width - 1, self.height - 1)
+        game_map.add_change_listener(self.tiles_changed)
+
+    def __contains__(self, name):
+        return name in self.fields
+
+    def __getitem__(self, name):
+        return self.fields[name]
+
+    def index(self, x, y):
+        """
+        :return int: index of a tile in the padded layout
+        """
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise IndexError("tile index out of range")
+        return (y + 1) * self.stride + x
+
+    def _copy_rows(self, x1, y1, x2, y2):
+        plane, width, stride = self.game_map.block_move_plane, self.width, self.stride
+        for y in range(y1, y2 + 1):
+            start = (y + 1) * stride
+            self.blocked[start + x1:start + x2 + 1] = plane[y * width + x1:y * width + x2 + 1]
+
+    def add(self, name, sources):
+        """
+        Create or replace a field and compute it
+        :param str name: layer name, e.g. "players"
+        :param sources: iterable of (x, y) tiles
+        :return DistanceField:
+        """
+        field = DistanceField(self, sources)
+        field.compute()
+        self.fields[name] = field
+        return field
+
+    def add_many(self, layers):
+        """
+        Create or replace several fields, computed together in one BFS.
+        The search expands each tile once per distance it is reached at,
+        for all the fields reaching it then at once, instead of once per field.
+        :param dict layers: layer name -> iterable of (x, y) sources
+        :return list: the DistanceFields, in the order given
+        """
+        names = list(layers)
+        fields = [DistanceField(self, layers[name]) for name in names]
+        blocked, stride = self.blocked, self.stride
+        offsets = (-1, 1, -stride, stride)
+        # Bit f of reached[index] is set once field f has reached the tile;
+        # blocked tiles count as reached by every field
+        every = (1 << len(fields)) - 1
+        reached = [every if tile else 0 for tile in blocked]
+        frontier = {}
+        for bit, field in enumerate(fields):
+            for index in field.sources:
+                if not blocked[index]:
+                    field.values[index] = 0
+                    reached[index] |= 1 << bit
+                    frontier[index] = frontier.get(index, 0) | 1 << bit
+        distance = 0
+        while frontier and distance + 1 < UNREACHED:
+            distance += 1
+            following = {}
+            for index, mask in frontier.items():
+                for offset in offsets:
+                    neighbor = index + offset
+                    new = mask & ~reached[neighbor]
+                    if new:
+                        reached[neighbor] |= new
+                        following[neighbor] = following.get(neighbor, 0) | new
+            for index, mask in following.items():
+                while mask:
+                    low = mask & -mask
+                    fields[low.bit_length() - 1].values[index] = distance
+                    mask ^= low
+            frontier = following
+        for name, field in zip(names, fields):
+            self.fields[name] = field
+        return fields
+
+    def remove(self, name):
+        del self.fields[name]
+
+    def close(self):
+        """
+        Stop watching the map and drop every field
+        """
+        self.game_map.remove_change_listener(self.tiles_changed)
+        self.fields.clear()
+
+    def tiles_changed(self, x1, y1, x2, y2):
+        """
+        Change listener: find the tiles whose blocking changed and update
+        every field around them
+        """
+        x1, y1 = max(x1, 0), max(y1, 0)
+        x2, y2 = min(x2, self.width - 1), min(y2, self.height - 1)
+        plane, width, stride = self.game_map.block_move_plane, self.width, self.stride
+        opened, closed = [], []
+        for y in range(y1, y2 + 1):
+            row = plane[y * width + x1:y * width + x2 + 1]
+            start = (y + 1) * stride + x1
+            if row == self.blocked[start:start + len(row)]:
+                continue
+            for offset, now in enumerate(row):
+                if now != self.blocked[start + offset]:
+                    (closed if now else opened).append(start + offset)
+        if not (opened or closed):
+            return
+        for index in closed:
+            self.blocked[index] = 1
+        for field in self.fields.values():
+            field._closed(closed)
+        for index in opened:
+            self.blocked[index] = 0
+        for field in self.fields.values():
+            field._opened(opened)
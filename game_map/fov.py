@@ -0,0 +1,140 @@
+"""
+Field of view over the block_sight plane of a GameMap, by recursive
+shadowcasting (run here with an explicit stack instead of recursion).
+
+FieldOfView caches the visible tiles per (x, y, radius) and listens for
+changes to the map, dropping only the cached views whose area a change
+touches.
+"""
+from collections import OrderedDict
+
+# Transforms from octant coordinates (column, row) to map offsets
+_OCTANTS = (
+    (1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+    (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1),
+)
+
+
+def compute_fov(game_map, x, y, radius):
+    """
+    Find the tiles visible from a point. Walls that can be seen are included;
+    tiles outside the map count as sight-blocking and are never included.
+    :param GameMap game_map:
+    :param int x: X position of the viewer
+    :param int y: Y position of the viewer
+    :param int radius: how far the viewer can see
+    :return set: flat indices (y * width + x) of the visible tiles
+    """
+    width, height = game_map.width, game_map.height
+    plane = game_map.block_sight_plane
+    visible = set()
+    if not (0 <= x < width and 0 <= y < height):
+        return visible
+    visible.add(y * width + x)
+    radius_squared = radius * radius
+    for xx, xy, yx, yy in _OCTANTS:
+        # Rows still to scan, with the slopes of the light reaching them
+        stack = [(1, 1.0, 0.0)]
+        while stack:
+            row, start, end = stack.pop()
+            if start < end:
+                continue
+            for distance in range(row, radius + 1):
+                dy = -distance
+                blocked = False
+                new_start = start
+                for dx in range(-distance, 1):
+                    left_slope = (dx - 0.5) / (dy + 0.5)
+                    right_slope = (dx + 0.5) / (dy - 0.5)
+                    if start < right_slope:
+                        continue
+                    if end > left_slope:
+                        break
+                    tile_x = x + dx * xx + dy * xy
+                    tile_y = y + dx * yx + dy * yy
+                    inside = 0 <= tile_x < width and 0 <= tile_y < height
+                    index = tile_y * width + tile_x
+                    if inside and dx * dx + dy * dy <= radius_squared:
+                        visible.add(index)
+                    opaque = not inside or plane[index]
+                    if blocked:
+                        if opaque:
+                            new_start = right_slope
+                        else:
+                            blocked = False
+                            start = new_start
+                    elif opaque and distance < radius:
+                        blocked = True
+                        stack.append((distance + 1, start, left_slope))
+                        new_start = right_slope
+                if blocked:
+                    break
+    return visible
+
+
+class FieldOfView:
+    """
+    Cached field of view for one GameMap.
+    Views are kept for the most recent max_entries (x, y, radius) queries.
+    When tiles change through the map's methods or tiles, only the views
+    whose square of tiles within radius overlaps the change are dropped.
+    """
+    def __init__(self, game_map, max_entries=256):
+        """
+        :param GameMap game_map: map to watch
+        :param int max_entries: most views kept in the cache
+        """
+        self.game_map = game_map
+        self.max_entries = max_entries
+        # (x, y, radius) -> frozenset of flat indices, least recently used first
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        game_map.add_change_listener(self.invalidate)
+
+    def close(self):
+        """
+        Stop watching the map and drop the cache
+        """
+        self.game_map.remove_change_listener(self.invalidate)
+        self.cache.clear()
+
+    def visible(self, x, y, radius):
+        """
+        :param int x: X position of the viewer
+        :param int y: Y position of the viewer
+        :param int radius: how far the viewer can see
+        :return frozenset: flat indices (y * width + x) of the visible tiles
+        """
+        key = (x, y, radius)
+        view = self.cache.get(key)
+        if view is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return view
+        self.misses += 1
+        view = frozenset(compute_fov(self.game_map, x, y, radius))
+        self.cache[key] = view
+        if len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+        return view
+
+    def is_visible(self, x, y, radius, target_x, target_y):
+        """
+        :return bool: True if the target tile can be seen from (x, y)
+        """
+        return target_y * self.game_map.width + target_x in self.visible(x, y, radius)
+
+    def invalidate(self, x1, y1, x2, y2):
+        """
+        Drop the cached views that could see any tile of a rectangle
+        :param int x1: Left edge
+        :param int y1: Top edge
+        :param int x2: Right edge
+        :param int y2: Bottom edge
+        """
+        stale = [key for key in self.cache
+                 if key[0] - key[2] <= x2 and key[0] + key[2] >= x1 and
+                 key[1] - key[2] <= y2 and key[1] + key[2] >= y1]
+        for key in stale:
+            del self.cache[key]
@@ -1,4 +1,6 @@
-from game_map.tile import Tile
+from game_map.distance_field import DistanceLayers
+from game_map.render import RowRenderer, join_bands
+from game_map.tile_grid import TileGrid
 
 
 class GameMap:
@@ -11,6 +13,36 @@ class GameMap:
         self.width = width
         self.height = height
         self.tiles = None
+        # One byte per tile, row-major: index = y * width + x
+        self.block_move_plane = None
+        self.block_sight_plane = None
+        # Called with (x1, y1, x2, y2) after tiles change, see add_change_listener
+        self.change_listeners = []
+        # Named distance fields, see add_distance_field
+        self.distance_layers = None
+
+    def add_change_listener(self, listener):
+        """
+        Get told about changes made through the map's methods and tiles.
+        Code writing to the planes directly should call tiles_changed.
+        :param listener: function(x1, y1, x2, y2) given the inclusive bounds
+            of the tiles that changed
+        """
+        self.change_listeners.append(listener)
+
+    def remove_change_listener(self, listener):
+        self.change_listeners.remove(listener)
+
+    def tiles_changed(self, x1, y1, x2, y2):
+        """
+        Tell the change listeners that tiles in a rectangle may have changed
+        :param int x1: Left edge
+        :param int y1: Top edge
+        :param int x2: Right edge
+        :param int y2: Bottom edge
+        """
+        for listener in self.change_listeners:
+            listener(x1, y1, x2, y2)
 
     def clear_map(self, default_block_move=True, default_block_sight=True):
         """
@@ -18,11 +50,173 @@ class GameMap:
         :param bool default_block_move: do Tile prevent movement by default
         :param bool default_block_sight: do Tiles block sight by default
         """
-        self.tiles = [
-            [Tile(block_move=default_block_move,
-                  block_sight=default_block_sight)
-             for _ in range(self.height)]
-            for _ in range(self.width)]
+        size = self.width * self.height
+        self.block_move_plane = bytearray([bool(default_block_move)]) * size
+        self.block_sight_plane = bytearray([bool(default_block_sight)]) * size
+        self.tiles = TileGrid(self)
+        if self.change_listeners:
+            self.tiles_changed(0, 0, self.width - 1, self.height - 1)
+
+    def add_distance_field(self, name, sources):
+        """
+        Add a named layer holding the distance from every tile to the
+        nearest source, kept up to date as tiles change
+        :param str name: layer name, e.g. "players"
+        :param sources: iterable of (x, y) tiles
+        :return DistanceField:
+        """
+        if self.distance_layers is None:
+            self.distance_layers = DistanceLayers(self)
+        return self.distance_layers.add(name, sources)
+
+    def add_distance_fields(self, layers):
+        """
+        Add several named distance layers, computed together in one pass
+        :param dict layers: layer name -> iterable of (x, y) sources
+        :return list: the DistanceFields, in the order given
+        """
+        if self.distance_layers is None:
+            self.distance_layers = DistanceLayers(self)
+        return self.distance_layers.add_many(layers)
+
+    def distance_field(self, name):
+        """
+        :param str name: layer name
+        :return DistanceField:
+        """
+        return self.distance_layers[name]
+
+    def index(self, x, y):
+        """
+        Flat index of a tile in the tile planes
+        :param int x: Target X position
+        :param int y: Target Y position
+        :return int: index into block_move_plane / block_sight_plane
+        """
+        return y * self.width + x
+
+    def set_tile(self, x, y, block_state=False):
+        """
+        Set both movement and sight blocking for one tile
+        :param int x: Target X position
+        :param int y: Target Y position
+        :param bool block_state: True if the tile should be solid
+        """
+        index = y * self.width + x
+        self.block_move_plane[index] = block_state
+        self.block_sight_plane[index] = block_state
+        if self.change_listeners:
+            self.tiles_changed(x, y, x, y)
+
+    def fill_rect(self, x1, y1, x2, y2, block_state=False):
+        """
+        Set every tile of a rectangle, one slice write per row and plane.
+        Corners are inclusive; the area is clipped to the map.
+        :param int x1: Left edge
+        :param int y1: Top edge
+        :param int x2: Right edge
+        :param int y2: Bottom edge
+        :param bool block_state: True if the tiles should be solid
+        """
+        x1, y1 = max(x1, 0), max(y1, 0)
+        x2, y2 = min(x2, self.width - 1), min(y2, self.height - 1)
+        if x1 > x2 or y1 > y2:
+            return
+        width = self.width
+        if x1 == 0 and x2 == width - 1:
+            # Whole rows are one contiguous slice
+            value = bytes([bool(block_state)]) * ((y2 - y1 + 1) * width)
+            self.block_move_plane[y1 * width:(y2 + 1) * width] = value
+            self.block_sight_plane[y1 * width:(y2 + 1) * width] = value
+        else:
+            value = bytes([bool(block_state)]) * (x2 - x1 + 1)
+            for row in range(y1 * width, (y2 + 1) * width, width):
+                self.block_move_plane[row + x1:row + x2 + 1] = value
+                self.block_sight_plane[row + x1:row + x2 + 1] = value
+        if self.change_listeners:
+            self.tiles_changed(x1, y1, x2, y2)
+
+    def outline_rect(self, x1, y1, x2, y2, block_state=True):
+        """
+        Set the border tiles of a rectangle, e.g. to wall in a room.
+        Corners are inclusive; the area is clipped to the map.
+        :param int x1: Left edge
+        :param int y1: Top edge
+        :param int x2: Right edge
+        :param int y2: Bottom edge
+        :param bool block_state: True if the tiles should be solid
+        """
+        if x1 > x2 or y1 > y2:
+            return
+        self.carve_line(x1, y1, x2, y1, block_state)
+        self.carve_line(x1, y2, x2, y2, block_state)
+        self.carve_line(x1, y1, x1, y2, block_state)
+        self.carve_line(x2, y1, x2, y2, block_state)
+
+    def carve_line(self, x1, y1, x2, y2, block_state=False):
+        """
+        Set the tiles on a line between two points, ends included.
+        Horizontal and vertical lines are a single slice write per plane;
+        other lines follow Bresenham's algorithm.
+        :param int x1: Start X position
+        :param int y1: Start Y position
+        :param int x2: End X position
+        :param int y2: End Y position
+        :param bool block_state: True if the tiles should be solid
+        """
+        if y1 == y2:
+            self.fill_rect(min(x1, x2), y1, max(x1, x2), y1, block_state)
+        elif x1 == x2:
+            if not 0 <= x1 < self.width:
+                return
+            y1, y2 = max(min(y1, y2), 0), min(max(y1, y2), self.height - 1)
+            if y1 > y2:
+                return
+            width = self.width
+            value = bytes([bool(block_state)]) * (y2 - y1 + 1)
+            column = slice(y1 * width + x1, y2 * width + x1 + 1, width)
+            self.block_move_plane[column] = value
+            self.block_sight_plane[column] = value
+            if self.change_listeners:
+                self.tiles_changed(x1, y1, x1, y2)
+        else:
+            if self.change_listeners:
+                changed = (max(min(x1, x2), 0), max(min(y1, y2), 0),
+                           min(max(x1, x2), self.width - 1), min(max(y1, y2), self.height - 1))
+            width, block_state = self.width, bool(block_state)
+            dx, dy = abs(x2 - x1), -abs(y2 - y1)
+            step_x = 1 if x1 < x2 else -1
+            step_y = 1 if y1 < y2 else -1
+            error = dx + dy
+            while True:
+                if 0 <= x1 < width and 0 <= y1 < self.height:
+                    self.block_move_plane[y1 * width + x1] = block_state
+                    self.block_sight_plane[y1 * width + x1] = block_state
+                if x1 == x2 and y1 == y2:
+                    break
+                double_error = 2 * error
+                if double_error >= dy:
+                    error += dy
+                    x1 += step_x
+                if double_error <= dx:
+                    error += dx
+                    y1 += step_y
+            if self.change_listeners:
+                self.tiles_changed(*changed)
+
+    def apply_ops(self, ops):
+        """
+        Apply a batch of carving operations in order
+        :param ops: iterable of (name, x1, y1, x2, y2, block_state) tuples,
+            name being "fill_rect", "outline_rect" or "carve_line"
+        """
+        operations = {
+            "fill_rect": self.fill_rect,
+            "outline_rect": self.outline_rect,
+            "carve_line": self.carve_line,
+        }
+        for name, *args in ops:
+            operations[name](*args)
 
     def create_room(self, room):
         """
@@ -30,9 +224,7 @@ class GameMap:
         :param Map.room.Room room: The room in the map
         """
         # Make interior tiles passable
-        for x in range(room.x1, room.x2 + 1):
-            for y in range(room.y1, room.y2 + 1):
-                self.tiles[x][y].block()
+        self.fill_rect(room.x1, room.y1, room.x2, room.y2, False)
 
     def create_h_tunnel(self, x1, x2, y):
         """
@@ -41,8 +233,7 @@ class GameMap:
         :param int x2: End of Tunnel
         :param int y: The y position of the tunnel
         """
-        for x in range(min(x1, x2), max(x1, x2) + 1):
-            self.tiles[x][y].block(False)
+        self.carve_line(x1, y, x2, y, False)
 
     def create_v_tunnel(self, y1, y2, x):
         """
@@ -51,8 +242,7 @@ class GameMap:
         :param int y2: End of Tunnel
         :param int x: X position of the tunnel
         """
-        for y in range(min(y1, y2), max(y1, y2) + 1):
-            self.tiles[x][y].block(False)
+        self.carve_line(x, y1, x, y2, False)
 
     def point_in_map(self, x, y):
         """
@@ -71,6 +261,100 @@ class GameMap:
         """
         return self.point_in_map(room.x1, room.y1) and self.point_in_map(room.x2, room.y2)
 
+    def iter_row_bytes(self, block_char="#", open_char="."):
+        """
+        Yield the rendered rows of the map, top to bottom, without newlines
+        :param block_char: symbol to represent a sight-blocking tile
+        :param open_char: symbol to represent a see-through tile
+        :return: generator of UTF-8 encoded rows
+        """
+        renderer = RowRenderer(open_char, block_char)
+        plane = self.block_sight_plane
+        for start in range(0, self.width * self.height, self.width):
+            yield renderer.row_bytes(plane[start:start + self.width])
+
+    def iter_rows(self, block_char="#", open_char="."):
+        """
+        Yield the rendered rows of the map, top to bottom, without newlines
+        :param block_char: symbol to represent a sight-blocking tile
+        :param open_char: symbol to represent a see-through tile
+        :return: generator of str rows
+        """
+        renderer = RowRenderer(open_char, block_char)
+        plane = self.block_sight_plane
+        for start in range(0, self.width * self.height, self.width):
+            yield renderer.row_text(plane[start:start + self.width])
+
+    def iter_bands(self, band=64, block_char="#", open_char="."):
+        """
+        Yield the rendered map a band of rows at a time, for writing a map
+        out without building its whole text
+        :param int band: most rows per band
+        :param block_char: symbol to represent a sight-blocking tile
+        :param open_char: symbol to represent a see-through tile
+        :return: generator of str, every row newline-terminated
+        """
+        return join_bands(self.iter_rows(block_char, open_char), band, "\n")
+
+    def iter_bands_digging(self, segments, dig, band=64, block_char="#", open_char="."):
+        """
+        Dig a list of segments from the top of the map down, yielding each
+        band once every segment that starts above its last row is dug.
+        A band is only final if no segment starting lower reaches up into it,
+        e.g. corridors planned as horizontal and vertical runs.
+        :param segments: Rects to dig, in the order they must be dug
+        :param dig: callable digging one segment
+        :param int band: most rows per band
+        :param block_char: symbol to represent a sight-blocking tile
+        :param open_char: symbol to represent a see-through tile
+        :return: generator of str, every row newline-terminated
+        """
+        return join_bands(self._iter_rows_digging(segments, dig, block_char, open_char),
+                          band, "\n")
+
+    def _iter_rows_digging(self, segments, dig, block_char, open_char):
+        # Stable, so segments starting on the same row keep their order
+        segments = sorted(segments, key=lambda segment: segment.y1)
+        renderer = RowRenderer(open_char, block_char)
+        plane = self.block_sight_plane
+        next_segment = 0
+        for y in range(self.height):
+            while next_segment < len(segments) and segments[next_segment].y1 <= y:
+                dig(segments[next_segment])
+                next_segment += 1
+            start = y * self.width
+            yield renderer.row_text(plane[start:start + self.width])
+        for segment in segments[next_segment:]:
+            dig(segment)
+
+    def iter_band_bytes(self, band=64, block_char="#", open_char="."):
+        """
+        Same as iter_bands, UTF-8 encoded
+        :return: generator of bytes, every row newline-terminated
+        """
+        return join_bands(self.iter_row_bytes(block_char, open_char), band, b"\n")
+
+    def printable_bytes(self, block_char="#", open_char="."):
+        """
+        Produce an encoded representation of the current Game Map
+        :param block_char: symbol to represent a sight-blocking tile
+        :param open_char: symbol to represent a see-through tile
+        :return bytes: UTF-8 text, one newline-terminated line per row
+        """
+        return b"".join(self.iter_band_bytes(max(self.height, 1), block_char, open_char))
+
+    def printable_buffer(self, block_char="#", open_char="."):
+        """
+        Same as printable_bytes, rendered into one mutable buffer
+        :param block_char: symbol to represent a sight-blocking tile
+        :param open_char: symbol to represent a see-through tile
+        :return memoryview: view over the rendered map
+        """
+        buffer = bytearray()
+        for band in self.iter_band_bytes(64, block_char, open_char):
+            buffer += band
+        return memoryview(buffer)
+
     def printable_map(self, block_char="#", open_char="."):
         """
         Produce a string representation of the current Game Map
@@ -78,13 +362,4 @@ class GameMap:
         :param open_char: symbol to represent a see-through tile
         :return str: Printable Representation of the Game Map
         """
-        output = ""
-        for y in range(0, self.height):
-            line = ""
-            for x in range(0, self.width):
-                if self.tiles[x][y].block_sight:
-                    line += block_char
-                else:
-                    line += open_char
-            output += line + "\n"
-        return output
+        return "".join(self.iter_bands(max(self.height, 1), block_char, open_char))
@@ -0,0 +1,98 @@
+"""
+Opt-in instrumentation for the generators.
+
+A generator given a GenerationStats records how long each phase took, how
+often things happened (rooms attempted, tiles written, ...) and per-step
+series such as CA cells changed. Without one, the generators only pay for
+an `is None` check.
+"""
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+
+class GenerationStats:
+    """
+    Phase timers, counters and series collected while generating one map
+    """
+    def __init__(self, callback=None):
+        """
+        :param callback: optional function(event, name, value) called for
+            every "phase", "count" and "record" event as it happens
+        """
+        self.phases = {}
+        self.counters = {}
+        self.series = {}
+        self.callbacks = [callback] if callback is not None else []
+
+    def subscribe(self, callback):
+        """
+        :param callback: function(event, name, value)
+        """
+        self.callbacks.append(callback)
+
+    def _emit(self, event, name, value):
+        for callback in self.callbacks:
+            callback(event, name, value)
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Time a block of code, adding to the total for this phase
+        :param str name: phase name
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            total = self.phases.setdefault(name, {"seconds": 0.0, "calls": 0})
+            total["seconds"] += elapsed
+            total["calls"] += 1
+            self._emit("phase", name, elapsed)
+
+    def count(self, name, amount=1):
+        """
+        :param str name: counter name
+        :param int amount: value to add
+        """
+        self.counters[name] = self.counters.get(name, 0) + amount
+        self._emit("count", name, amount)
+
+    def record(self, name, value):
+        """
+        Append a value to a series, e.g. one entry per CA step
+        :param str name: series name
+        :param value: value to append
+        """
+        self.series.setdefault(name, []).append(value)
+        self._emit("record", name, value)
+
+    def as_dict(self):
+        """
+        :return dict: JSON-serialisable copy of everything collected
+        """
+        return {
+            "phases": {name: dict(total) for name, total in self.phases.items()},
+            "counters": dict(self.counters),
+            "series": {name: list(values) for name, values in self.series.items()},
+        }
+
+
+def timed_phase(name):
+    """
+    Decorate a generator method so it is timed as a phase when the
+    generator has a stats object (self.stats), and called directly otherwise.
+    Phase times are not exclusive: a phase that calls another includes its
+    time, so the generators call their phases one after the other.
+    :param str name: phase name
+    """
+    def decorate(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.stats is None:
+                return method(self, *args, **kwargs)
+            with self.stats.phase(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,241 @@
+"""
+Compact binary map files.
+
+Layout (little-endian):
+    magic    4 bytes  b"DGNM"
+    version  uint16
+    kind     uint8    KIND_GAME_MAP or KIND_CA_MAP
+    planes   uint8    number of tile planes
+    width    uint32
+    height   uint32
+    rooms    uint32   number of room records
+    planes   one bit per tile each, row-major (index y * width + x),
+             most significant bit first, padded to a whole byte
+    rooms    int32 x, y, width, height per room
+
+A GameMap stores its block_move and block_sight planes; a CAMap stores one
+plane of live cells. Rooms are optional, e.g. BSPDungeon.rooms_list or
+Miner.features.
+
+Other kinds of map are added with register_map_kind, from the module that
+defines them, so this module does not depend on every map class; CAMap is
+registered by cell.cellular_automaton_dungeon.
+"""
+import mmap
+import struct
+
+from game_map.game_map import GameMap
+from game_map.rect import Rect
+
+MAGIC = b"DGNM"
+# File name extension used for map files
+EXTENSION = ".dgm"
+VERSION = 1
+KIND_GAME_MAP = 0
+KIND_CA_MAP = 1
+
+HEADER = struct.Struct("<4sHBBIII")
+ROOM = struct.Struct("<iiii")
+
+# kind -> (map class, map -> list of planes, (width, height, planes) -> map)
+_KINDS = {}
+
+_TO_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+_FROM_DIGITS = bytes.maketrans(b"01", b"\x00\x01")
+
+
+def plane_size(width, height):
+    """
+    :return int: bytes taken by one bit-packed plane
+    """
+    return (width * height + 7) // 8
+
+
+def pack_plane(plane):
+    """
+    Pack a plane of 0/1 bytes into bits
+    :param bytes plane: one byte per tile
+    :return bytes: one bit per tile, most significant bit first
+    """
+    size = (len(plane) + 7) // 8
+    if not size:
+        return b""
+    digits = bytes(plane).translate(_TO_DIGITS) + b"0" * (size * 8 - len(plane))
+    return int(digits, 2).to_bytes(size, "big")
+
+
+def unpack_plane(data, count):
+    """
+    Unpack bits into a plane of 0/1 bytes
+    :param bytes data: packed plane
+    :param int count: number of tiles in the plane
+    :return bytes: one byte per tile
+    """
+    if not count:
+        return b""
+    digits = format(int.from_bytes(data, "big"), "b").zfill(len(data) * 8)
+    return digits.encode("ascii")[:count].translate(_FROM_DIGITS)
+
+
+def register_map_kind(kind, map_class, to_planes, from_planes):
+    """
+    Teach write_map and MappedMap.to_map a kind of map
+    :param int kind: value stored in the file header, e.g. KIND_CA_MAP
+    :param type map_class: maps of this class (or a subclass) are written as kind
+    :param to_planes: callable taking a map, returning its planes as row-major 0/1 bytes
+    :param from_planes: callable taking width, height and a callable giving
+        a plane by number, returning the loaded map
+    """
+    _KINDS[kind] = (map_class, to_planes, from_planes)
+
+
+def _map_planes(game_map):
+    """
+    :return int, list: kind of map, its planes as row-major 0/1 bytes
+    """
+    for kind, (map_class, to_planes, _) in _KINDS.items():
+        if isinstance(game_map, map_class):
+            return kind, to_planes(game_map)
+    raise TypeError("No map kind registered for {}".format(type(game_map).__name__))
+
+
+def _game_map_from_planes(width, height, plane):
+    game_map = GameMap(width, height)
+    game_map.clear_map()
+    game_map.block_move_plane[:] = plane(0)
+    game_map.block_sight_plane[:] = plane(1)
+    return game_map
+
+
+register_map_kind(KIND_GAME_MAP, GameMap,
+                  lambda game_map: [game_map.block_move_plane, game_map.block_sight_plane],
+                  _game_map_from_planes)
+
+
+def write_map(stream, game_map, rooms=None):
+    """
+    Write a map to a binary file object
+    :param stream: file opened for binary writing
+    :param game_map: GameMap or CAMap to store
+    :param list rooms: optional list of Rect
+    """
+    rooms = rooms or []
+    kind, planes = _map_planes(game_map)
+    stream.write(HEADER.pack(MAGIC, VERSION, kind, len(planes),
+                             game_map.width, game_map.height, len(rooms)))
+    for plane in planes:
+        stream.write(pack_plane(plane))
+    for room in rooms:
+        stream.write(ROOM.pack(room.x1, room.y1, room.width, room.height))
+
+
+def save_map(path, game_map, rooms=None):
+    """
+    Write a map to a binary file
+    :param str path: file to create
+    :param game_map: GameMap or CAMap to store
+    :param list rooms: optional list of Rect
+    """
+    with open(path, "wb") as stream:
+        write_map(stream, game_map, rooms)
+
+
+def load_map(path):
+    """
+    Read a whole map file back into memory
+    :param str path: file to read
+    :return: GameMap or CAMap, list of Rect
+    """
+    with open_map(path) as mapped:
+        return mapped.to_map(), mapped.rooms()
+
+
+def open_map(path):
+    """
+    Memory-map a map file so tiles can be read without loading the grid
+    :param str path: file to read
+    :return MappedMap:
+    """
+    return MappedMap(path)
+
+
+class MappedMap:
+    """
+    Read-only access to a memory-mapped map file.
+    Tiles are read straight from the file's pages when asked for.
+    """
+    def __init__(self, path):
+        with open(path, "rb") as stream:
+            self.data = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (magic, version, self.kind, self.plane_count,
+             self.width, self.height, self.room_count) = HEADER.unpack_from(self.data)
+        except struct.error:
+            self.close()
+            raise ValueError("{} is not a map file".format(path))
+        if magic != MAGIC:
+            self.close()
+            raise ValueError("{} is not a map file".format(path))
+        if version != VERSION:
+            self.close()
+            raise ValueError("Unsupported map file version: {}".format(version))
+        self.plane_bytes = plane_size(self.width, self.height)
+        self.rooms_offset = HEADER.size + self.plane_count * self.plane_bytes
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.data.close()
+
+    def tile_bit(self, plane, x, y):
+        """
+        Read one tile from a plane
+        :param int plane: plane number
+        :param int x: Target X position
+        :param int y: Target Y position
+        :return bool: value stored for the tile
+        """
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise IndexError("tile index out of range")
+        index = y * self.width + x
+        offset = HEADER.size + plane * self.plane_bytes + (index >> 3)
+        return bool(self.data[offset] & (0x80 >> (index & 7)))
+
+    def block_move(self, x, y):
+        return self.tile_bit(0, x, y)
+
+    def block_sight(self, x, y):
+        return self.tile_bit(1 if self.kind == KIND_GAME_MAP else 0, x, y)
+
+    def alive(self, x, y):
+        return self.tile_bit(0, x, y)
+
+    def plane(self, plane):
+        """
+        :param int plane: plane number
+        :return bytes: the whole plane unpacked to one byte per tile
+        """
+        start = HEADER.size + plane * self.plane_bytes
+        return unpack_plane(self.data[start:start + self.plane_bytes],
+                            self.width * self.height)
+
+    def rooms(self):
+        """
+        :return list: stored rooms as Rect
+        """
+        return [Rect(*ROOM.unpack_from(self.data, self.rooms_offset + i * ROOM.size))
+                for i in range(self.room_count)]
+
+    def to_map(self):
+        """
+        Load the whole grid
+        :return: GameMap or CAMap
+        """
+        if self.kind not in _KINDS:
+            raise ValueError("Unknown map kind {}: import the module that registers it"
+                             .format(self.kind))
+        return _KINDS[self.kind][2](self.width, self.height, self.plane)
@@ -0,0 +1,98 @@
+class OccupancyGrid:
+    """
+    Tracks which tiles are still free of placed rects.
+    The whole grid is one Python int used as a bitset: bit y * stride + x is
+    set while tile (x, y) is free. Each row is followed by one spare bit that
+    is never set, so shifting never carries a run from one row into the next.
+    Finding every position where a rect fits then takes a handful of shifts
+    and ands over the whole grid.
+    """
+    # Bytes scanned at a time when locating a sampled position
+    CHUNK_BYTES = 512
+
+    def __init__(self, width, height):
+        """
+        :param int width: Map width in tiles
+        :param int height: Map height in tiles
+        """
+        self.width = width
+        self.height = height
+        self.stride = width + 1
+        self.free = self._block(0, 0, width, height)
+
+    def _block(self, x, y, width, height):
+        """
+        Bitmask of a block of tiles
+        :return int: bits set for x..x+width-1, y..y+height-1
+        """
+        if width <= 0 or height <= 0:
+            return 0
+        row = ((1 << width) - 1) << x
+        # 1 at the start of every row: (2^(stride*height) - 1) / (2^stride - 1)
+        repeat = ((1 << (self.stride * height)) - 1) // ((1 << self.stride) - 1)
+        return (row * repeat) << (y * self.stride)
+
+    def occupy(self, rect):
+        """
+        Mark the tiles of a rect as used, edges included (as in Rect.intersect)
+        :param Rect rect:
+        """
+        x1, x2 = max(rect.x1, 0), min(rect.x2, self.width - 1)
+        y1, y2 = max(rect.y1, 0), min(rect.y2, self.height - 1)
+        self.free &= ~self._block(x1, y1, x2 - x1 + 1, y2 - y1 + 1)
+
+    @staticmethod
+    def _runs(bits, length, distance):
+        """
+        Keep the bits that start a run of length set bits spaced by distance.
+        Uses doubling, so it takes log2(length) passes.
+        """
+        covered = 1
+        while covered < length:
+            step = min(covered, length - covered)
+            bits &= bits >> (step * distance)
+            covered += step
+        return bits
+
+    def free_positions(self, width, height):
+        """
+        Find every place a Rect(x, y, width, height) fits without touching
+        an occupied tile, staying inside the map
+        :param int width: rect width (covers width + 1 tiles)
+        :param int height: rect height (covers height + 1 tiles)
+        :return int: bitset with bit y * stride + x set for each valid (x, y)
+        """
+        across = self._runs(self.free, width + 1, 1)
+        return self._runs(across, height + 1, self.stride)
+
+    def sample(self, width, height, rng):
+        """
+        Pick a uniformly random position where a rect of this size fits
+        :param int width: rect width
+        :param int height: rect height
+        :param rng: random number generator
+        :return: (x, y), or None if there is no room left for this size
+        """
+        positions = self.free_positions(width, height)
+        total = positions.bit_count()
+        if not total:
+            return None
+        pick = rng.randrange(total)
+        # Walk the bitset in chunks to find the one holding the picked bit
+        data = positions.to_bytes((positions.bit_length() + 7) // 8, "little")
+        for offset in range(0, len(data), self.CHUNK_BYTES):
+            chunk = int.from_bytes(data[offset:offset + self.CHUNK_BYTES], "little")
+            count = chunk.bit_count()
+            if pick < count:
+                break
+            pick -= count
+        # Then find the lowest bit of the chunk with pick + 1 set bits at or below it
+        low, high = 0, chunk.bit_length() - 1
+        while low < high:
+            middle = (low + high) // 2
+            if (chunk & ((2 << middle) - 1)).bit_count() > pick:
+                high = middle
+            else:
+                low = middle + 1
+        y, x = divmod(offset * 8 + low, self.stride)
+        return x, y
@@ -0,0 +1,73 @@
+from itertools import islice
+
+
+def check_band(band):
+    """
+    :raise ValueError: if band is not a usable number of rows per band
+    """
+    if band < 1:
+        raise ValueError("band must be at least 1")
+
+
+def join_bands(rows, band, newline):
+    """
+    Group rendered rows into bands, without holding more than one band.
+    band is checked on the call, not when the first band is asked for.
+    :param rows: iterable of rows without newlines, all str or all bytes
+    :param int band: most rows per band
+    :param newline: "\n" or b"\n", matching the rows
+    :return: generator of bands, every row in them newline-terminated
+    """
+    check_band(band)
+    return _join_bands(iter(rows), band, newline)
+
+
+def _join_bands(rows, band, newline):
+    while True:
+        chunk = list(islice(rows, band))
+        if not chunk:
+            return
+        chunk.append(newline[:0])
+        yield newline.join(chunk)
+
+
+class RowRenderer:
+    """
+    Turns rows of 0/1 bytes into printable text.
+    Single-byte characters go through bytes.translate; anything else
+    falls back to str.translate.
+    """
+    def __init__(self, zero_char, one_char):
+        """
+        :param str zero_char: symbol for cells holding 0
+        :param str one_char: symbol for cells holding 1
+        """
+        self.zero_char = zero_char
+        self.one_char = one_char
+        try:
+            symbols = (zero_char + one_char).encode("ascii")
+        except UnicodeEncodeError:
+            symbols = b""
+        if len(symbols) == 2:
+            self.table = bytes.maketrans(b"\x00\x01", symbols)
+        else:
+            self.table = None
+            self.text_table = {0: zero_char, 1: one_char}
+
+    def row_bytes(self, raw):
+        """
+        :param bytes raw: one row of 0/1 bytes
+        :return bytes: the rendered row, UTF-8 encoded
+        """
+        if self.table is not None:
+            return bytes(raw).translate(self.table)
+        return self.row_text(raw).encode("utf-8")
+
+    def row_text(self, raw):
+        """
+        :param bytes raw: one row of 0/1 bytes
+        :return str: the rendered row
+        """
+        if self.table is not None:
+            return raw.translate(self.table).decode("ascii")
+        return bytes(raw).decode("latin-1").translate(self.text_table)
@@ -0,0 +1,59 @@
+"""
+Random number generators for the generators.
+
+The generators draw with the random.Random methods (randint with an
+inclusive upper bound, randrange, choice, random). A numpy Generator has
+different methods and ranges, so it is wrapped in NumpyRandom, which gives
+it those of random.Random. The same seeded Generator still reproduces the
+same map, though not the map random.Random(seed) makes.
+"""
+import random
+
+
+class NumpyRandom:
+    """
+    The random.Random methods used by the generators, drawn from a numpy Generator
+    """
+    def __init__(self, generator):
+        """
+        :param generator: numpy.random.Generator
+        """
+        self.generator = generator
+
+    def randint(self, a, b):
+        """
+        :return int: a <= N <= b, as random.Random.randint
+        """
+        return int(self.generator.integers(a, b + 1))
+
+    def randrange(self, start, stop=None, step=1):
+        """
+        :return int: as random.Random.randrange
+        """
+        if stop is None:
+            start, stop = 0, start
+        count = (stop - start + step - (1 if step > 0 else -1)) // step
+        if count <= 0:
+            raise ValueError("empty range for randrange({}, {}, {})".format(start, stop, step))
+        return start + step * int(self.generator.integers(count))
+
+    def choice(self, seq):
+        if not seq:
+            raise IndexError("Cannot choose from an empty sequence")
+        return seq[int(self.generator.integers(len(seq)))]
+
+    def random(self):
+        return float(self.generator.random())
+
+
+def as_random(rng):
+    """
+    :param rng: random.Random, the random module, a numpy Generator or None
+        for the random module
+    :return: rng with the random.Random methods the generators use
+    """
+    if rng is None:
+        return random
+    if hasattr(rng, "integers"):
+        return NumpyRandom(rng)
+    return rng
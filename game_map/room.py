@@ -1,4 +1,5 @@
-from random import randint
+import random
+
 from game_map.direction import Direction
 from game_map.rect import Rect
 
@@ -25,16 +26,17 @@ class Room(Rect):
         elif direction == Direction.LEFT:
             return self.x1 - 1, self.y1, self.x1 - 1, self.y2
 
-    def get_wall_point(self, direction=None):
+    def get_wall_point(self, direction=None, rng=random):
         """
         Returns a random point from the wall in the indicated direction
         :param Direction direction:
+        :param rng: random number generator, defaults to the random module
         :return int, int: x, y point along wall
         """
         if direction is None:
-            direction = Direction.random_direction()
+            direction = Direction.random_direction(rng)
 
         x1, y1, x2, y2 = self.get_wall(direction)
-        x = randint(x1, x2)
-        y = randint(y1, y2)
+        x = rng.randint(x1, x2)
+        y = rng.randint(y1, y2)
         return x, y
@@ -0,0 +1,522 @@
+"""
+Room connectivity graphs, derived from a generated map.
+
+Every open tile belongs to a region: the room whose tiles cover it (the one
+added first, where rooms overlap), or else a section of corridor, corridors
+being the connected groups of open tiles outside every room, cut along a
+grid of CELL_SIZE so no section is large. Two regions meet at doors, where
+open tiles of both lie side by side.
+
+The graph nodes are the door tiles and the room centres, linked by the
+number of steps between them inside their region, so distances in the graph
+are walking distances. A path query searches tiles only inside the regions
+of the start, the goal and the doors in between. Room to room distance and
+next hop tables can be precomputed with compute_distances.
+"""
+import heapq
+from array import array
+from collections import deque
+
+# Marks unreachable pairs in the distance and next hop tables
+UNREACHABLE = -1
+# Corridors are split into sections of at most CELL_SIZE x CELL_SIZE tiles
+CELL_SIZE = 16
+
+
+def grid_path(game_map, start, goal, bounds=None):
+    """
+    Shortest path over the tiles that do not block movement, 4-connected
+    :param GameMap game_map:
+    :param start: (x, y) tile to start from
+    :param goal: (x, y) tile to reach
+    :param bounds: optional (x1, y1, x2, y2), inclusive, to search within
+    :return list: (x, y) tiles from start to goal, or None if there is no path
+    """
+    width = game_map.width
+    if bounds is None:
+        x1, y1, x2, y2 = 0, 0, width - 1, game_map.height - 1
+    else:
+        x1, y1, x2, y2 = bounds
+        x1, y1 = max(x1, 0), max(y1, 0)
+        x2, y2 = min(x2, width - 1), min(y2, game_map.height - 1)
+    blocked = game_map.block_move_plane
+    (sx, sy), (gx, gy) = start, goal
+    for x, y in (start, goal):
+        if not (x1 <= x <= x2 and y1 <= y <= y2) or blocked[y * width + x]:
+            return None
+    source, target = sy * width + sx, gy * width + gx
+    parents = {source: source}
+    queue = deque([source])
+    while queue:
+        index = queue.popleft()
+        if index == target:
+            path = []
+            while index != source:
+                path.append(divmod(index, width)[::-1])
+                index = parents[index]
+            path.append(start)
+            path.reverse()
+            return path
+        y, x = divmod(index, width)
+        for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+            if x1 <= nx <= x2 and y1 <= ny <= y2:
+                neighbor = ny * width + nx
+                if neighbor not in parents and not blocked[neighbor]:
+                    parents[neighbor] = index
+                    queue.append(neighbor)
+    return None
+
+
+class Corridor:
+    """
+    A connected group of open tiles outside every room
+    """
+    __slots__ = ("regions", "tiles", "rooms", "doors")
+
+    def __init__(self):
+        # Region ids of its sections in the RoomGraph
+        self.regions = []
+        self.tiles = 0
+        # Ids of the rooms it opens onto
+        self.rooms = set()
+        # ((x, y) in the corridor, (x, y) in the room) per door
+        self.doors = []
+
+
+class RoomGraph:
+    """
+    Rooms and corridors of a map, joined at their doors.
+    The graph describes the map as it was when built; find_path checks its
+    result against the current map and falls back to a full search.
+    """
+    def __init__(self, game_map, rooms, extents=None):
+        """
+        :param GameMap game_map: generated map
+        :param list rooms: Rects of the rooms, whose ids are their positions
+        :param list extents: (x1, y1, x2, y2) per room, the tiles it was carved
+            into, inclusive. Generators differ in how a Rect maps to tiles;
+            by default every tile from x1, y1 to x2, y2 is the room's.
+        """
+        self.width = game_map.width
+        self.height = game_map.height
+        self.rooms = list(rooms)
+        if extents is None:
+            extents = [(room.x1, room.y1, room.x2, room.y2) for room in self.rooms]
+        self.extents = list(extents)
+        # Padded layout as in DistanceLayers: index (y + 1) * stride + x,
+        # with the spare column and rows marked -1 like blocked tiles
+        self.stride = self.width + 1
+        self.region = array("i", [-1]) * ((self.height + 2) * self.stride)
+        self.corridors = []
+        # Corridor of each section; regions from len(rooms) on are sections
+        self.sections = []
+        # Per region: {other region: [(tile, tile), ...]} of door tiles, padded indices
+        self.adjacency = []
+        # Per region: padded indices of its graph nodes
+        self.region_nodes = []
+        # Node -> {node: steps}
+        self.links = {}
+        # Node of each room's centre, or None for a room with no open tile
+        self.anchors = []
+        # Flat rooms x rooms tables, built by compute_distances
+        self.distances = None
+        self.next_hop = None
+        self._label_rooms(game_map.block_move_plane)
+        self._label_corridors()
+        self._find_doors()
+        self._link_nodes()
+
+    def __len__(self):
+        return len(self.rooms)
+
+    def index(self, x, y):
+        """
+        :return int: padded index of a tile, or None outside the map
+        """
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return (y + 1) * self.stride + x
+        return None
+
+    def tile(self, index):
+        """
+        :return tuple: (x, y) of a padded index
+        """
+        y, x = divmod(index, self.stride)
+        return x, y - 1
+
+    def region_at(self, x, y):
+        """
+        :return int: region of an open tile: a room id below len(rooms),
+            otherwise a corridor; None for blocked tiles
+        """
+        index = self.index(x, y)
+        if index is None or self.region[index] < 0:
+            return None
+        return self.region[index]
+
+    def room_at(self, x, y):
+        """
+        :return int: id of the room an open tile belongs to, or None
+        """
+        region = self.region_at(x, y)
+        if region is None or region >= len(self.rooms):
+            return None
+        return region
+
+    def corridor_at(self, x, y):
+        """
+        :return Corridor: the corridor an open tile belongs to, or None
+        """
+        region = self.region_at(x, y)
+        if region is None or region < len(self.rooms):
+            return None
+        return self.sections[region - len(self.rooms)]
+
+    def neighbors(self, room):
+        """
+        :param int room: room id
+        :return set: rooms sharing a door with it or opening onto the same corridor
+        """
+        found = set()
+        for other in self.adjacency[room]:
+            if other < len(self.rooms):
+                found.add(other)
+            else:
+                found.update(self.sections[other - len(self.rooms)].rooms)
+        found.discard(room)
+        return found
+
+    def _label_rooms(self, blocked):
+        region, width, stride = self.region, self.width, self.stride
+        for room_id, (x1, y1, x2, y2) in enumerate(self.extents):
+            x1, y1 = max(x1, 0), max(y1, 0)
+            x2, y2 = min(x2, width - 1), min(y2, self.height - 1)
+            for y in range(y1, y2 + 1):
+                offset = (y + 1) * stride - y * width
+                for tile in range(y * width + x1, y * width + x2 + 1):
+                    if not blocked[tile] and region[tile + offset] < 0:
+                        region[tile + offset] = room_id
+        # Open tiles outside every room, grouped into corridors next
+        for y in range(self.height):
+            offset = (y + 1) * stride - y * width
+            for tile in range(y * width, (y + 1) * width):
+                if not blocked[tile] and region[tile + offset] < 0:
+                    region[tile + offset] = -2
+
+    def _label_corridors(self):
+        """
+        Split the open tiles outside every room into sections, connected
+        within one cell of the grid each, so that no region is large.
+        Until _find_doors groups them, sections holds their tile counts.
+        """
+        region, stride = self.region, self.stride
+        for start in range(len(region)):
+            if region[start] != -2:
+                continue
+            section = len(self.rooms) + len(self.sections)
+            column, row = start % stride // CELL_SIZE, start // stride // CELL_SIZE
+            region[start] = section
+            queue = deque([start])
+            tiles = 0
+            while queue:
+                index = queue.popleft()
+                tiles += 1
+                for neighbor in (index - 1, index + 1, index - stride, index + stride):
+                    if (region[neighbor] == -2 and neighbor % stride // CELL_SIZE == column and
+                            neighbor // stride // CELL_SIZE == row):
+                        region[neighbor] = section
+                        queue.append(neighbor)
+            self.sections.append(tiles)
+
+    def _find_doors(self):
+        """
+        Find every pair of side by side tiles in two regions, and group the
+        corridor sections that meet into corridors
+        """
+        region, stride = self.region, self.stride
+        rooms = len(self.rooms)
+        count = rooms + len(self.sections)
+        self.adjacency = [{} for _ in range(count)]
+        self.region_nodes = [[] for _ in range(count)]
+        # Union-find over the sections
+        parents = list(range(len(self.sections)))
+
+        def root(section):
+            while parents[section] != section:
+                parents[section] = parents[parents[section]]
+                section = parents[section]
+            return section
+
+        nodes = set()
+        for index in range(stride, len(region) - stride):
+            a = region[index]
+            if a < 0:
+                continue
+            for other in (index + 1, index + stride):
+                b = region[other]
+                if b < 0 or b == a:
+                    continue
+                self.adjacency[a].setdefault(b, []).append((index, other))
+                self.adjacency[b].setdefault(a, []).append((other, index))
+                self._link(index, other, 1)
+                nodes.update((index, other))
+                if a >= rooms and b >= rooms:
+                    parents[root(a - rooms)] = root(b - rooms)
+
+        corridors = {}
+        for section, tiles in enumerate(self.sections):
+            corridor = corridors.get(root(section))
+            if corridor is None:
+                corridor = corridors[root(section)] = Corridor()
+                self.corridors.append(corridor)
+            self.sections[section] = corridor
+            corridor.regions.append(rooms + section)
+            corridor.tiles += tiles
+            for other, pairs in self.adjacency[rooms + section].items():
+                if other < rooms:
+                    corridor.rooms.add(other)
+                    corridor.doors.extend((self.tile(a), self.tile(b)) for a, b in pairs)
+
+        for room_id, room in enumerate(self.rooms):
+            anchor = self.index(*room.center())
+            if anchor is None or region[anchor] != room_id:
+                anchor = self._first_tile(room_id)
+            self.anchors.append(anchor)
+            if anchor is not None:
+                nodes.add(anchor)
+        for node in sorted(nodes):
+            self.region_nodes[region[node]].append(node)
+
+    def _first_tile(self, room_id):
+        x1, y1, x2, y2 = self.extents[room_id]
+        for y in range(max(y1, 0), min(y2, self.height - 1) + 1):
+            for x in range(max(x1, 0), min(x2, self.width - 1) + 1):
+                index = self.index(x, y)
+                if self.region[index] == room_id:
+                    return index
+        return None
+
+    def _link(self, a, b, steps):
+        for first, second in ((a, b), (b, a)):
+            links = self.links.setdefault(first, {})
+            if steps < links.get(second, steps + 1):
+                links[second] = steps
+
+    def _link_nodes(self):
+        """
+        Link every pair of nodes in the same region by their steps apart
+        """
+        for nodes in self.region_nodes:
+            for position, node in enumerate(nodes):
+                self.links.setdefault(node, {})
+                for other, steps in self._reach(node, nodes[position + 1:]).items():
+                    self._link(node, other, steps)
+
+    def _reach(self, source, targets):
+        """
+        Breadth-first search from a tile that stays inside its region
+        :param int source: padded index
+        :param targets: padded indices to look for
+        :return dict: steps to each target found
+        """
+        region, stride = self.region, self.stride
+        inside = region[source]
+        remaining = set(targets)
+        found = {}
+        if source in remaining:
+            found[source] = 0
+            remaining.discard(source)
+        seen = {source}
+        frontier = [source]
+        steps = 0
+        while frontier and remaining:
+            steps += 1
+            following = []
+            for index in frontier:
+                for neighbor in (index - 1, index + 1, index - stride, index + stride):
+                    if neighbor not in seen and region[neighbor] == inside:
+                        seen.add(neighbor)
+                        following.append(neighbor)
+                        if neighbor in remaining:
+                            found[neighbor] = steps
+                            remaining.discard(neighbor)
+            frontier = following
+        return found
+
+    def _region_path(self, source, target):
+        """
+        :return list: padded indices from source to target inside their region
+        """
+        region, stride = self.region, self.stride
+        inside = region[source]
+        parents = {source: source}
+        queue = deque([source])
+        while queue:
+            index = queue.popleft()
+            if index == target:
+                break
+            for neighbor in (index - 1, index + 1, index - stride, index + stride):
+                if neighbor not in parents and region[neighbor] == inside:
+                    parents[neighbor] = index
+                    queue.append(neighbor)
+        path = [target]
+        while path[-1] != source:
+            path.append(parents[path[-1]])
+        path.reverse()
+        return path
+
+    def _search(self, source, target):
+        """
+        A* over the graph nodes between two open tiles
+        :param int source: padded index
+        :param int target: padded index
+        :return: (steps, waypoints), waypoints being the padded indices of
+            source, the nodes passed and target, or None if there is no route
+        """
+        region, stride = self.region, self.stride
+        if region[source] < 0 or region[target] < 0:
+            return None
+        targets = list(self.region_nodes[region[source]])
+        if region[target] == region[source]:
+            targets.append(target)
+        starts = self._reach(source, targets)
+        ends = self._reach(target, self.region_nodes[region[target]])
+        goal_y, goal_x = divmod(target, stride)
+
+        best_steps, last = starts.get(target), source
+        if best_steps is None:
+            best_steps = float("inf")
+        parents = {}
+        costs = {}
+        queue = []
+        for node, steps in starts.items():
+            if node != target:
+                parents[node] = source
+                costs[node] = steps
+                y, x = divmod(node, stride)
+                queue.append((steps + abs(x - goal_x) + abs(y - goal_y), steps, node))
+        heapq.heapify(queue)
+        while queue:
+            estimate, steps, node = heapq.heappop(queue)
+            if estimate >= best_steps:
+                break
+            if steps > costs[node]:
+                continue
+            if node in ends and steps + ends[node] < best_steps:
+                best_steps, last = steps + ends[node], node
+            for other, length in self.links[node].items():
+                total = steps + length
+                if total < costs.get(other, total + 1):
+                    costs[other] = total
+                    parents[other] = node
+                    y, x = divmod(other, stride)
+                    heapq.heappush(queue, (total + abs(x - goal_x) + abs(y - goal_y), total, other))
+        if best_steps == float("inf"):
+            return None
+        waypoints = [target]
+        node = last
+        while node != source:
+            waypoints.append(node)
+            node = parents[node]
+        waypoints.append(source)
+        waypoints.reverse()
+        if waypoints[-2] == target:
+            del waypoints[-1]
+        return best_steps, waypoints
+
+    def compute_distances(self):
+        """
+        Run Dijkstra over the graph from the centre of every room, filling
+        the distance and next hop tables: the steps between room centres and
+        the first other room entered on the way. Both take rooms^2 ints.
+        """
+        count = len(self.rooms)
+        region = self.region
+        distances = array("i", [UNREACHABLE]) * (count * count)
+        next_hop = array("i", [UNREACHABLE]) * (count * count)
+        for source, anchor in enumerate(self.anchors):
+            if anchor is None:
+                continue
+            row = source * count
+            costs = {anchor: 0}
+            hops = {anchor: source}
+            queue = [(0, anchor)]
+            while queue:
+                steps, node = heapq.heappop(queue)
+                if steps > costs[node]:
+                    continue
+                hop = hops[node]
+                for other, length in self.links[node].items():
+                    total = steps + length
+                    if total < costs.get(other, total + 1):
+                        costs[other] = total
+                        entered = region[other]
+                        if hop == source and entered < count and entered != source:
+                            hops[other] = entered
+                        else:
+                            hops[other] = hop
+                        heapq.heappush(queue, (total, other))
+            for room, other in enumerate(self.anchors):
+                if other in costs:
+                    distances[row + room] = costs[other]
+                    next_hop[row + room] = hops[other]
+        self.distances = distances
+        self.next_hop = next_hop
+
+    def distance(self, a, b):
+        """
+        :return int: steps between the centres of two rooms, or UNREACHABLE
+        """
+        if self.distances is not None:
+            return self.distances[a * len(self.rooms) + b]
+        if self.anchors[a] is None or self.anchors[b] is None:
+            return UNREACHABLE
+        found = self._search(self.anchors[a], self.anchors[b])
+        return UNREACHABLE if found is None else found[0]
+
+    def route(self, a, b):
+        """
+        :return list: ids of the rooms passed through on a shortest walk
+            between the centres of a and b, or None if they are not connected
+        """
+        if self.anchors[a] is None or self.anchors[b] is None:
+            return None
+        found = self._search(self.anchors[a], self.anchors[b])
+        if found is None:
+            return None
+        rooms = [a]
+        for node in found[1]:
+            room = self.region[node]
+            if room < len(self.rooms) and room != rooms[-1]:
+                rooms.append(room)
+        return rooms
+
+    def find_path(self, game_map, start, goal):
+        """
+        Find a shortest walkable path using the graph: the route is planned
+        over the doors, then only the tiles of the regions it crosses are
+        searched. Falls back to a search of the whole map when the graph has
+        no route or the path found has since been blocked.
+        :param GameMap game_map: map the graph was built for
+        :param start: (x, y) tile to start from
+        :param goal: (x, y) tile to reach
+        :return list: (x, y) tiles from start to goal, or None if there is no path
+        """
+        source, target = self.index(*start), self.index(*goal)
+        found = None
+        if source is not None and target is not None:
+            found = self._search(source, target)
+        if found is None:
+            return grid_path(game_map, start, goal)
+        waypoints = found[1]
+        tiles = [source]
+        for node, following in zip(waypoints, waypoints[1:]):
+            if self.region[node] == self.region[following]:
+                tiles.extend(self._region_path(node, following)[1:])
+            else:
+                tiles.append(following)
+        path = [self.tile(index) for index in tiles]
+        width, blocked = game_map.width, game_map.block_move_plane
+        if any(blocked[y * width + x] for x, y in path):
+            return grid_path(game_map, start, goal)
+        return path
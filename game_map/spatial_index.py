@@ -0,0 +1,63 @@
+class SpatialIndex:
+    """
+    Uniform grid of buckets over Rects, for fast overlap tests.
+    A rect is stored in every bucket its area touches, so a query only
+    compares against rects that share a bucket with it.
+    """
+    def __init__(self, cell_size=16):
+        """
+        :param int cell_size: width and height of a bucket in tiles
+        """
+        self.cell_size = cell_size
+        self.buckets = {}
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _cells(self, rect):
+        """
+        Keys of the buckets covered by a rect, edges included
+        :param Rect rect:
+        """
+        size = self.cell_size
+        x1, x2 = sorted((rect.x1, rect.x2))
+        y1, y2 = sorted((rect.y1, rect.y2))
+        for bucket_x in range(x1 // size, x2 // size + 1):
+            for bucket_y in range(y1 // size, y2 // size + 1):
+                yield bucket_x, bucket_y
+
+    def insert(self, rect):
+        """
+        :param Rect rect: rect to add to the index
+        """
+        for cell in self._cells(rect):
+            self.buckets.setdefault(cell, []).append(rect)
+        self.count += 1
+
+    def query(self, rect):
+        """
+        Find every indexed rect overlapping the given one
+        :param Rect rect: area to test
+        :return list: overlapping rects, as decided by Rect.intersect
+        """
+        found = []
+        seen = set()
+        for cell in self._cells(rect):
+            for other in self.buckets.get(cell, ()):
+                if id(other) not in seen:
+                    seen.add(id(other))
+                    if rect.intersect(other):
+                        found.append(other)
+        return found
+
+    def intersects(self, rect):
+        """
+        :param Rect rect: area to test
+        :return bool: True if any indexed rect overlaps it
+        """
+        for cell in self._cells(rect):
+            for other in self.buckets.get(cell, ()):
+                if rect.intersect(other):
+                    return True
+        return False
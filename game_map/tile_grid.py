@@ -0,0 +1,97 @@
+class TileRef:
+    """
+    A lightweight handle onto one tile of a packed GameMap.
+    Behaves like a Tile, but reads and writes the map's tile planes.
+    """
+    __slots__ = ("game_map", "index")
+
+    def __init__(self, game_map, index):
+        """
+        :param GameMap game_map: map holding the tile planes
+        :param int index: flat (row-major) index of the tile
+        """
+        self.game_map = game_map
+        self.index = index
+
+    def _changed(self):
+        game_map = self.game_map
+        if game_map.change_listeners:
+            y, x = divmod(self.index, game_map.width)
+            game_map.tiles_changed(x, y, x, y)
+
+    @property
+    def block_move(self):
+        return bool(self.game_map.block_move_plane[self.index])
+
+    @block_move.setter
+    def block_move(self, value):
+        self.game_map.block_move_plane[self.index] = bool(value)
+        self._changed()
+
+    @property
+    def block_sight(self):
+        return bool(self.game_map.block_sight_plane[self.index])
+
+    @block_sight.setter
+    def block_sight(self, value):
+        self.game_map.block_sight_plane[self.index] = bool(value)
+        self._changed()
+
+    def block(self, block_state=False):
+        """
+        :param bool block_state:
+        """
+        self.game_map.block_move_plane[self.index] = bool(block_state)
+        self.game_map.block_sight_plane[self.index] = bool(block_state)
+        self._changed()
+
+
+class TileColumn:
+    """
+    One column (fixed x) of a TileGrid, indexed by y
+    """
+    __slots__ = ("game_map", "x")
+
+    def __init__(self, game_map, x):
+        self.game_map = game_map
+        self.x = x
+
+    def __len__(self):
+        return self.game_map.height
+
+    def __getitem__(self, y):
+        height = self.game_map.height
+        if y < 0:
+            y += height
+        if not 0 <= y < height:
+            raise IndexError("tile y index out of range")
+        return TileRef(self.game_map, y * self.game_map.width + self.x)
+
+    def __iter__(self):
+        for y in range(self.game_map.height):
+            yield self[y]
+
+
+class TileGrid:
+    """
+    A tiles[x][y] compatible view over the packed tile planes of a GameMap
+    """
+    __slots__ = ("game_map",)
+
+    def __init__(self, game_map):
+        self.game_map = game_map
+
+    def __len__(self):
+        return self.game_map.width
+
+    def __getitem__(self, x):
+        width = self.game_map.width
+        if x < 0:
+            x += width
+        if not 0 <= x < width:
+            raise IndexError("tile x index out of range")
+        return TileColumn(self.game_map, x)
+
+    def __iter__(self):
+        for x in range(self.game_map.width):
+            yield self[x]
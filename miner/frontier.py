@@ -0,0 +1,181 @@
+from game_map.direction import Direction
+from game_map.rect import Rect
+
+
+class _FenwickTree:
+    """
+    Prefix sums over a growing list of weights, for weighted sampling.
+    Appending, updating and finding a prefix all take O(log n).
+    """
+    def __init__(self):
+        self.weights = []
+        # 1-based partial sums; tree[i] sums weights (i - lowbit(i), i]
+        self.tree = [0]
+        self.total = 0
+
+    def __len__(self):
+        return len(self.weights)
+
+    def _prefix(self, count):
+        """
+        :return int: sum of the first count weights
+        """
+        total = 0
+        while count:
+            total += self.tree[count]
+            count &= count - 1
+        return total
+
+    def append(self, weight):
+        index = len(self.tree)
+        lowbit = index & -index
+        self.tree.append(weight + self._prefix(index - 1) - self._prefix(index - lowbit))
+        self.weights.append(weight)
+        self.total += weight
+
+    def update(self, slot, weight):
+        delta = weight - self.weights[slot]
+        self.weights[slot] = weight
+        self.total += delta
+        index = slot + 1
+        while index < len(self.tree):
+            self.tree[index] += delta
+            index += index & -index
+
+    def find(self, target):
+        """
+        :param int target: 0 <= target < total
+        :return int: slot whose weight covers target in the running sum
+        """
+        index = 0
+        step = 1 << (len(self.tree) - 1).bit_length()
+        while step:
+            following = index + step
+            if following < len(self.tree) and self.tree[following] <= target:
+                index = following
+                target -= self.tree[following]
+            step >>= 1
+        return index
+
+
+class FrontierIndex:
+    """
+    The walls of placed features that still have free space behind them.
+    A wall is drawn with a weight equal to the depth of free space behind
+    it, capped at max_depth, so walls facing open ground are tried most.
+    Free space only shrinks as features are added, so weights are kept as
+    upper bounds and only brought up to date when a wall is drawn: a drawn
+    wall is accepted with probability current / stored weight, which gives
+    the same odds as keeping every weight exact.
+    Walls with less than min_depth free, or that failed retire_after times
+    in a row, are dropped.
+    """
+    def __init__(self, game_map, feature_index, min_depth=2, max_depth=12, retire_after=8):
+        """
+        :param GameMap game_map: map being dug; features stay off its border
+        :param SpatialIndex feature_index: the placed features
+        :param int min_depth: walls with less free depth are dropped
+        :param int max_depth: depth beyond which walls are not weighted higher
+        :param int retire_after: failures in a row before a wall is dropped
+        """
+        self.width = game_map.width
+        self.height = game_map.height
+        self.feature_index = feature_index
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.retire_after = retire_after
+        self.walls = []
+        self.failures = []
+        self.weights = _FenwickTree()
+
+    def __len__(self):
+        """
+        :return int: walls still open, though some may have filled in since last drawn
+        """
+        return sum(1 for weight in self.weights.weights if weight)
+
+    def add_feature(self, feature):
+        """
+        Add the four walls of a newly placed feature
+        :param Rect feature:
+        """
+        for direction in Direction:
+            self.walls.append((feature, direction))
+            self.failures.append(0)
+            self.weights.append(self.max_depth)
+
+    def depth(self, feature, direction):
+        """
+        Free rows or columns straight out from a wall, along its whole length
+        :param Rect feature:
+        :param Direction direction: wall of the feature
+        :return int: 0 to max_depth
+        """
+        cap = self.max_depth
+        if direction == Direction.UP:
+            x1, y = feature.x1, feature.y1 - 1
+            probe = Rect(x1, y - cap + 1, feature.x2 - x1, cap - 1)
+            depth = y
+        elif direction == Direction.RIGHT:
+            x, y1 = feature.x2 + 1, feature.y1
+            probe = Rect(x, y1, cap - 1, feature.y2 - y1)
+            depth = self.width - 1 - x
+        elif direction == Direction.DOWN:
+            x1, y = feature.x1, feature.y2 + 1
+            probe = Rect(x1, y, feature.x2 - x1, cap - 1)
+            depth = self.height - 1 - y
+        else:
+            x, y1 = feature.x1 - 1, feature.y1
+            probe = Rect(x - cap + 1, y1, cap - 1, feature.y2 - y1)
+            depth = x
+        depth = max(min(depth, cap), 0)
+        for other in self.feature_index.query(probe):
+            if direction == Direction.UP:
+                gap = y - other.y2
+            elif direction == Direction.RIGHT:
+                gap = other.x1 - x
+            elif direction == Direction.DOWN:
+                gap = other.y1 - y
+            else:
+                gap = x - other.x2
+            depth = min(depth, max(gap, 0))
+        return depth
+
+    def sample(self, rng):
+        """
+        Draw an open wall, weighted by the free depth behind it
+        :param rng: random number generator
+        :return: (slot, feature, direction, depth), or None once no wall is open
+        """
+        weights = self.weights
+        while weights.total:
+            slot = weights.find(rng.randrange(weights.total))
+            stored = weights.weights[slot]
+            feature, direction = self.walls[slot]
+            depth = self.depth(feature, direction)
+            if depth < self.min_depth:
+                weights.update(slot, 0)
+                continue
+            if depth < stored:
+                weights.update(slot, depth)
+                if rng.randrange(stored) >= depth:
+                    continue
+            return slot, feature, direction, depth
+        return None
+
+    def succeeded(self, slot):
+        """
+        Record a feature added through a wall
+        """
+        self.failures[slot] = 0
+
+    def failed(self, slot):
+        """
+        Record a failed attempt through a wall, dropping it after retire_after in a row
+        :return bool: True if the wall was dropped
+        """
+        self.failures[slot] += 1
+        if self.failures[slot] < self.retire_after:
+            return False
+        self.weights.update(slot, 0)
+        return True
@@ -1,7 +1,14 @@
-from random import randint
+import random
+
 from game_map.game_map import GameMap
 from game_map.room import Room
 from game_map.direction import Direction
+from game_map.instrumentation import timed_phase
+from game_map.render import check_band
+from game_map.rng import as_random
+from game_map.room_graph import RoomGraph
+from game_map.spatial_index import SpatialIndex
+from miner.frontier import FrontierIndex
 
 
 class Miner:
@@ -17,90 +24,220 @@ class Miner:
         Add the feature through the chosen wall
         Go back to step 3, until the dungeon is complete
     """
-    def __init__(self, game_map):
+    def __init__(self, game_map, rng=None, stats=None):
         """
         :param GameMap game_map:
+        :param rng: random number generator, random.Random(seed) or a numpy
+            Generator, defaults to the random module
+        :param GenerationStats stats: optional, collects phase timings and counters
         """
+        self.rng = as_random(rng)
+        self.stats = stats
         self.game_map = game_map
         self.game_map.clear_map()
         self.width = game_map.width
         self.height = game_map.height
         self.features = []
+        self.feature_index = SpatialIndex()
+        self._room_graph = None
+        # Walls with free space behind them, for generate
+        self.frontier = FrontierIndex(game_map, self.feature_index)
+
+    @property
+    def room_graph(self):
+        """
+        :return RoomGraph: features of the map and the corridors between them, built on first use
+        """
+        if self._room_graph is None:
+            self._room_graph = RoomGraph(self.game_map, self.features)
+        return self._room_graph
+
+    def generate(self, max_features, max_attempts=None):
+        """
+        Grow the dungeon feature by feature, with a loop instead of recursion.
+        Walls to dig through are drawn from the frontier index, which only
+        holds walls with free space behind them and favours the most open
+        ones, so attempts are not wasted on walls that are already boxed in.
+        Digs a starting room in the centre of the map if there is none yet.
+        :param int max_features: stop once this many features were added
+        :param int max_attempts: stop after this many attempts, defaults to
+            20 attempts per feature
+        :return int: number of features added
+        """
+        if max_attempts is None:
+            max_attempts = 20 * max_features
+        if not self.features:
+            self.add_feature(self.width // 2 - 2, self.height // 2 - 2, 4, 4)
+        added = attempts = 0
+        while added < max_features and attempts < max_attempts:
+            wall = self.frontier.sample(self.rng)
+            if wall is None:
+                break
+            slot, feature, direction, depth = wall
+            attempts += 1
+            if self._dig_through(feature, direction, depth):
+                added += 1
+                self.frontier.succeeded(slot)
+            elif self.frontier.failed(slot) and self.stats is not None:
+                self.stats.count("walls_retired")
+        return added
+
+    def stream(self, max_features, max_attempts=None, band=64, block_char="#", open_char="."):
+        """
+        Generate the dungeon, then yield it rendered a band of rows at a time.
+        Features can be added anywhere on the map, so no row is final before
+        the last one is dug, but the text of the map is never held in full.
+        :param int max_features: see generate
+        :param int max_attempts: see generate
+        :param int band: most rows per band
+        :param block_char: symbol to represent a sight-blocking tile
+        :param open_char: symbol to represent a see-through tile
+        :return: generator of str, every row newline-terminated
+        """
+        check_band(band)
+        return self._stream(max_features, max_attempts, band, block_char, open_char)
+
+    def _stream(self, max_features, max_attempts, band, block_char, open_char):
+        self.generate(max_features, max_attempts)
+        yield from self.game_map.iter_bands(band, block_char, open_char)
 
-    def generate_feature(self, direction=None, feature_index=None):
+    def generate_feature(self, direction=None, feature_index=None, fix_bounds=False):
+        """
+        Try to add a feature through a wall of an existing one. On failure,
+        try again from each earlier feature in turn, in a new direction.
+        This is the original recursive algorithm run as a loop: by default
+        it makes the same random draws and the same features, and raises
+        the same ValueError when a wall point lies on the map edge.
+        :param Direction direction: wall to dig through first, random by default
+        :param int feature_index: feature to start from, random by default
+        :param bool fix_bounds: count a wall point on the map edge as a failed
+            attempt instead of raising, and never make a feature of negative
+            width or height; this changes the features made for a seed
+        :return bool: True if a feature was added
+        """
         if direction is None:
-            direction = Direction.random_direction()
+            direction = Direction.random_direction(self.rng)
         if feature_index is None:
-            feature_index = randint(0, len(self.features)-1)
-
-        x, y = self.features[feature_index].get_wall_point(direction)
-        width = randint(1, 11)
-        height = randint(1, 11)
-        if direction == Direction.LEFT:
-            x -= width
-        if direction == Direction.UP:
-            y -= height
+            feature_index = self.rng.randint(0, len(self.features)-1)
 
-        x, y, width, height = self.select_feature(x, y, direction)
+        while not self._dig_through(self.features[feature_index], direction,
+                                    fix_bounds=fix_bounds):
+            if feature_index <= 0:
+                return False
+            feature_index -= 1
+            direction = Direction.random_direction(self.rng)
+        return True
 
-        if not self.add_feature(x, y, width, height) and feature_index > 0:
-            self.generate_feature(feature_index=feature_index-1)
+    def _dig_through(self, feature, direction, reach=None, fix_bounds=True):
+        """
+        Try to add one random feature through a wall of an existing one
+        :param Room feature: feature to start from
+        :param Direction direction: wall to dig through
+        :param int reach: free depth behind the wall, if known; the new
+            feature then starts at the wall and stays within reach of it
+        :param bool fix_bounds: see generate_feature
+        :return bool: True if a feature was added
+        """
+        try:
+            x, y = feature.get_wall_point(direction, self.rng)
+            if reach is None:
+                # Step out by a random size first, as the original algorithm does
+                width = self.rng.randint(1, 11)
+                height = self.rng.randint(1, 11)
+                if direction == Direction.LEFT:
+                    x -= width
+                if direction == Direction.UP:
+                    y -= height
+            x, y, width, height = self.select_feature(x, y, direction, reach, fix_bounds)
+        except ValueError:
+            if not fix_bounds:
+                raise
+            # The wall point is on or past the map edge: nothing fits there
+            if self.stats is not None:
+                self.stats.count("features_rejected_bounds")
+            return False
+        return self.add_feature(x, y, width, height)
 
-    def select_feature(self, x, y, direction):
+    def select_feature(self, x, y, direction, reach=None, fix_bounds=False):
+        """
+        Pick a corridor or room growing from (x, y) in a direction
+        :param int reach: if given, the far corner is at most this many
+            tiles from (x, y), counting both, on each axis
+        :param bool fix_bounds: return the size of the feature, instead of
+            the signed offset of the far corner the original algorithm gives
+        :return int, int, int, int: x, y, width, height
+        """
+        left, right = 1, self.width - 1
+        top, bottom = 1, self.height - 1
+        if reach is not None:
+            left, right = max(left, x - reach + 1), min(right, x + reach - 1)
+            top, bottom = max(top, y - reach + 1), min(bottom, y + reach - 1)
         x2, y2 = x, y
-        if randint(0, 1) == 0:
+        if self.rng.randint(0, 1) == 0:
             # Corridor
             if direction == Direction.UP:
                 x2 = x
-                y2 = randint(1, y)
+                y2 = self.rng.randint(top, y)
             if direction == Direction.RIGHT:
-                x2 = randint(x, self.width - 1)
+                x2 = self.rng.randint(x, right)
                 y2 = y
             if direction == Direction.DOWN:
                 x2 = x
-                y2 = randint(y, self.height - 1)
+                y2 = self.rng.randint(y, bottom)
             if direction == Direction.LEFT:
-                x2 = randint(1, x)
+                x2 = self.rng.randint(left, x)
                 y2 = y
         else:
             # Room
             if direction == Direction.UP:
-                x2 = randint(x, self.width - 1)
-                y2 = randint(1, y)
+                x2 = self.rng.randint(x, right)
+                y2 = self.rng.randint(top, y)
             if direction == Direction.RIGHT:
-                x2 = randint(x, self.width - 1)
-                y2 = randint(y, self.height - 1)
+                x2 = self.rng.randint(x, right)
+                y2 = self.rng.randint(y, bottom)
             if direction == Direction.DOWN:
-                x2 = randint(x, self.width - 1)
-                y2 = randint(y, self.height - 1)
+                x2 = self.rng.randint(x, right)
+                y2 = self.rng.randint(y, bottom)
             if direction == Direction.LEFT:
-                x2 = randint(1, x)
-                y2 = randint(y, self.height - 1)
+                x2 = self.rng.randint(left, x)
+                y2 = self.rng.randint(y, bottom)
 
+        if fix_bounds:
+            return min(x, x2), min(y, y2), abs(x2 - x), abs(y2 - y)
         return min(x, x2), min(y, y2), x2 - x, y2 - y
 
+    @timed_phase("add_feature")
     def add_feature(self, x, y, width, height):
         room = Room(x, y, width, height)
+        if self.stats is not None:
+            self.stats.count("features_attempted")
 
         if not self.game_map.room_in_map(room):
+            if self.stats is not None:
+                self.stats.count("features_rejected_bounds")
             return False
 
-        for other_room in self.features:
-            if room.intersect(other_room):
-                break
-        else:
-            self.features.append(room)
-            self.game_map.create_room(room)
-            return True
-        return False
+        if self.feature_index.intersects(room):
+            if self.stats is not None:
+                self.stats.count("features_rejected_overlap")
+            return False
+        if self.stats is not None:
+            self.stats.count("features_added")
+            self.stats.count("tiles_written", max(width + 1, 0) * max(height + 1, 0))
+        self.features.append(room)
+        self.feature_index.insert(room)
+        self.frontier.add_feature(room)
+        self._room_graph = None
+        self.game_map.create_room(room)
+        return True
 
 
 if __name__ == "__main__":
     test_map = GameMap(80, 25)
     miner = Miner(test_map)
-    x1 = randint(5, 60)
-    y1 = randint(5, 15)
+    x1 = random.randint(5, 60)
+    y1 = random.randint(5, 15)
     miner.add_feature(x1, y1, 5, 5)
-    miner.generate_feature()
+    miner.generate(40)
     print(miner.game_map.printable_map())
     print(len(miner.features))
@@ -1,8 +1,10 @@
-from random import randint, choice
-
 from game_map.direction import Direction
 from game_map.game_map import GameMap
+from game_map.instrumentation import timed_phase
+from game_map.rng import as_random
 from game_map.room import Room
+from game_map.spatial_index import SpatialIndex
+from miner.frontier import FrontierIndex
 
 
 class Miner:
@@ -19,26 +21,36 @@ class Miner:
         Go back to step 3, until the dungeon is complete
     """
 
-    def __init__(self, game_map):
+    def __init__(self, game_map, rng=None, stats=None):
         """
         :param GameMap game_map:
+        :param rng: random number generator, random.Random(seed) or a numpy
+            Generator, defaults to the random module
+        :param GenerationStats stats: optional, collects phase timings and counters
         """
+        self.rng = as_random(rng)
+        self.stats = stats
         self.game_map = game_map
         self.game_map.clear_map()
         self.width = game_map.width
         self.height = game_map.height
         self.features = []
+        self.feature_index = SpatialIndex()
+        # Walls with free space behind them, to grow new features from
+        self.frontier = FrontierIndex(game_map, self.feature_index)
         self.initial_feature()
 
     def initial_feature(self, width=None, height=None):
         if width is None:
-            width = randint(5, 11)
+            width = self.rng.randint(5, 11)
         if height is None:
-            height = randint(5, 11)
+            height = self.rng.randint(5, 11)
         x = self.width // 2 - width // 1
         y = self.height // 2 - height // 2
         room = Room(x, y, width, height)
         self.features.append(room)
+        self.feature_index.insert(room)
+        self.frontier.add_feature(room)
         self.game_map.create_room(room)
 
     def generate_features(self, max_features=10, min_features=5):
@@ -47,27 +59,37 @@ class Miner:
         while num_features < min_features and repeat > 0:
             repeat -= 1
             for r in range(num_features, max_features):
-                if self.add_feature(choice(self.features)):
+                wall = self.frontier.sample(self.rng)
+                if wall is None:
+                    return num_features
+                slot, room, direction, _ = wall
+                if self.add_feature(room, direction=direction):
                     num_features += 1
+                    self.frontier.succeeded(slot)
+                elif self.frontier.failed(slot) and self.stats is not None:
+                    self.stats.count("walls_retired")
         return num_features
 
-    def add_feature(self, room, width=None, height=None):
+    @timed_phase("add_feature")
+    def add_feature(self, room, width=None, height=None, direction=None):
         """
         Add a feature to the map
         :param Room room: room to start from
         :param int width:
         :param int height:
+        :param Direction direction: wall to build from, random by default
         :return bool: True if the feature was able to be added
         """
-        direction = Direction.random_direction()
+        if direction is None:
+            direction = Direction.random_direction(self.rng)
         if width is None:
-            width = randint(5, 9)
+            width = self.rng.randint(5, 9)
         if height is None:
-            height = randint(5, 7)
+            height = self.rng.randint(5, 7)
 
-        gap = randint(0, 3)
+        gap = self.rng.randint(0, 3)
 
-        x, y = room.get_wall(direction)
+        x, y = room.get_wall_point(direction, self.rng)
         if direction == Direction.UP:
             y -= (height + gap)
         elif direction == Direction.RIGHT:
@@ -78,18 +100,25 @@ class Miner:
             x -= (width + gap)
 
         new_room = Room(x, y, width, height)
+        if self.stats is not None:
+            self.stats.count("features_attempted")
 
         if self.game_map.room_in_map(new_room):
             # Check for Intersections
-            for other_room in self.features:
-                if new_room.intersect(other_room):
-                    break
-            else:
+            if not self.feature_index.intersects(new_room):
+                if self.stats is not None:
+                    self.stats.count("features_added")
+                    self.stats.count("tiles_written", (width + 1) * (height + 1))
                 self.features.append(new_room)
+                self.feature_index.insert(new_room)
+                self.frontier.add_feature(new_room)
                 self._add_corridor(room, new_room)
                 self.game_map.create_room(new_room)
                 return True
-
+            if self.stats is not None:
+                self.stats.count("features_rejected_overlap")
+        elif self.stats is not None:
+            self.stats.count("features_rejected_bounds")
         return False
 
     def _add_corridor(self, room1, room2):
@@ -98,8 +127,11 @@ class Miner:
         """
         x1, y1 = room1.center()
         x2, y2 = room2.center()
+        if self.stats is not None:
+            self.stats.count("corridors")
+            self.stats.count("tiles_written", abs(x2 - x1) + abs(y2 - y1) + 2)
         # Randomly determine corridor arrangement.
-        if randint(0, 1) == 1:
+        if self.rng.randint(0, 1) == 1:
             # Horizontal tunnel, then Vertical
             self.game_map.create_h_tunnel(x2, x1, y2)
             self.game_map.create_v_tunnel(y2, y1, x1)
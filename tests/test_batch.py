@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from batch.batch_generation import generate_batch, map_path
+from game_map.map_file import load_map
+
+
+def test_bad_arguments_raise_on_call(tmp_path):
+    with pytest.raises(ValueError):
+        generate_batch("NoSuchDungeon", [0], 20, 20, output_dir=str(tmp_path))
+    with pytest.raises(ValueError):
+        generate_batch("BSPDungeon", [0], 20, 20, output_dir=str(tmp_path), workers=0)
+
+
+def test_batch_writes_one_map_per_seed(tmp_path):
+    output_dir = str(tmp_path / "maps")
+    results = list(generate_batch("TutorialDungeon", [3, 1, 2], 40, 30,
+                                  {"max_rooms": 5}, output_dir, workers=1))
+    assert [seed for seed, _ in results] == [3, 1, 2]
+    for seed, path in results:
+        assert path == map_path(output_dir, "TutorialDungeon", seed)
+        assert os.path.exists(path)
+        game_map, rooms = load_map(path)
+        assert (game_map.width, game_map.height) == (40, 30)
+
+
+@pytest.mark.parametrize("generator, params", [
+    ("BSPDungeon", {}),
+    ("Miner", {"features": 20}),
+    ("CADungeon", {"steps": 3}),
+])
+def test_maps_do_not_depend_on_the_worker_count(tmp_path, generator, params):
+    seeds = list(range(6))
+    maps = {}
+    for workers in (1, 3):
+        output_dir = str(tmp_path / "workers_{}".format(workers))
+        for seed, path in generate_batch(generator, seeds, 48, 32, params, output_dir, workers):
+            with open(path, "rb") as stream:
+                maps.setdefault(seed, []).append(stream.read())
+    assert sorted(maps) == seeds
+    for first, second in maps.values():
+        assert first == second
+    assert len({first for first, _ in maps.values()}) == len(seeds)
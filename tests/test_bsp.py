@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+from benchmarks.bsp_corridors import run as run_corridor_benchmark
+from bsp.bsp_dungeon import BSPDungeon
+from game_map.game_map import GameMap
+
+
+def _generate(engine, seed, width, height, **kwargs):
+    rng = random.Random(seed)
+    dungeon = BSPDungeon(GameMap(width, height), rng, engine=engine)
+    dungeon.generate(**kwargs)
+    return dungeon, rng
+
+
+@pytest.mark.parametrize("fill", [False, True])
+@pytest.mark.parametrize("corridors", ["sequential", "tree"])
+def test_flat_engine_matches_leaf(fill, corridors):
+    for seed, (width, height) in enumerate([(80, 25), (120, 90), (300, 200)]):
+        leaf, leaf_rng = _generate("leaf", seed, width, height, fill=fill, corridors=corridors)
+        flat, flat_rng = _generate("flat", seed, width, height, fill=fill, corridors=corridors)
+        assert [(r.x1, r.y1, r.x2, r.y2) for r in flat.rooms_list] == \
+            [(r.x1, r.y1, r.x2, r.y2) for r in leaf.rooms_list]
+        assert flat.game_map.block_move_plane == leaf.game_map.block_move_plane
+        assert flat.corridor_tiles == leaf.corridor_tiles
+        # Both engines make the same random draws
+        assert flat_rng.random() == leaf_rng.random()
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        BSPDungeon(GameMap(20, 20), engine="recursive")
+
+
+def test_plan_then_dig_matches_generate():
+    built, _ = _generate("flat", 3, 100, 70, corridors="tree")
+    planned = BSPDungeon(GameMap(100, 70), random.Random(3), engine="flat")
+    planned.dig_segments(planned.plan(corridors="tree"))
+    assert planned.game_map.block_move_plane == built.game_map.block_move_plane
+
+
+def test_corridor_benchmark_digs_through_carved_rooms():
+    # Tiles opened by corridors once the rooms are drawn, as first measured
+    # for the tree corridors; many more means the rooms were never drawn
+    assert run_corridor_benchmark(400, "sequential")[2] == 6449
+    assert run_corridor_benchmark(400, "tree")[2] == 3983
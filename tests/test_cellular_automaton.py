@@ -0,0 +1,101 @@
+import random
+
+import pytest
+
+from cell.cellular_automaton_dungeon import CADungeon, numpy
+
+NEIGHBORS = [(dx, dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dx or dy]
+
+
+def _reference_step(tiles, width, height, death_limit=1, birth_limit=3, invalid=1,
+                    in_place=False):
+    """
+    The CA rule written out directly: in place updates read the cells
+    already updated in this step, in row-major scan order
+    """
+    source = tiles if in_place else [list(column) for column in tiles]
+    target = tiles if in_place else [list(column) for column in tiles]
+    for y in range(height):
+        for x in range(width):
+            count = 0
+            for dx, dy in NEIGHBORS:
+                tx, ty = x + dx, y + dy
+                if 0 <= tx < width and 0 <= ty < height:
+                    count += source[tx][ty]
+                else:
+                    count += invalid
+            if source[x][y]:
+                target[x][y] = count > death_limit
+            else:
+                target[x][y] = count > birth_limit
+    return target
+
+
+@pytest.mark.parametrize("in_place", [False, True])
+def test_step_matches_reference(in_place):
+    dungeon = CADungeon(23, 17, rng=random.Random(0), in_place=in_place)
+    expected = [list(column) for column in dungeon.current_map.tiles]
+    for _ in range(5):
+        expected = _reference_step(expected, 23, 17, in_place=in_place)
+        dungeon.step()
+        assert dungeon.current_map.tiles == expected
+
+
+def test_in_place_differs_from_double_buffer():
+    synchronous = CADungeon(40, 30, rng=random.Random(1))
+    in_place = CADungeon(40, 30, rng=random.Random(1), in_place=True)
+    synchronous.step()
+    in_place.step()
+    assert synchronous.current_map.tiles != in_place.current_map.tiles
+
+
+BACKENDS = ["incremental"] + (["numpy"] if numpy is not None else [])
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_backends_match_python(backend):
+    for seed in range(3):
+        python = CADungeon(45, 31, rng=random.Random(seed))
+        other = CADungeon(45, 31, rng=random.Random(seed), backend=backend)
+        for _ in range(6):
+            assert other.step() == python.step()
+            assert other.current_map.tiles == python.current_map.tiles
+
+
+@pytest.mark.parametrize("backend", ["python"] + BACKENDS)
+def test_generate_is_the_same_for_every_backend(backend):
+    expected = CADungeon(50, 30, rng=random.Random(4))
+    expected.generate(8, stop_early=False)
+    dungeon = CADungeon(50, 30, rng=random.Random(4), backend=backend)
+    dungeon.generate(8)
+    assert dungeon.current_map.tiles == expected.current_map.tiles
+
+
+def test_in_place_needs_the_python_backend():
+    with pytest.raises(ValueError):
+        CADungeon(10, 10, backend="incremental", in_place=True)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_backends_match_python_after_region_edits(backend):
+    python = CADungeon(45, 31, initial_live_chance=45, birth_limit=4, rng=random.Random(6))
+    other = CADungeon(45, 31, initial_live_chance=45, birth_limit=4, rng=random.Random(6),
+                      backend=backend)
+    for dungeon in (python, other):
+        dungeon.step()
+        dungeon.step()
+        dungeon.cull_regions(6)
+        dungeon.step()
+        dungeon.connect_regions()
+        dungeon.step()
+    assert other.current_map.tiles == python.current_map.tiles
+
+
+@pytest.mark.parametrize("backend", ["python"] + BACKENDS)
+def test_tiled_generation_matches_generate(backend):
+    expected = CADungeon(64, 48, rng=random.Random(8), backend=backend)
+    expected.generate(5, stop_early=False)
+    tiled = CADungeon(64, 48, rng=random.Random(8), backend=backend)
+    assert tiled.generate_tiled(5, workers=2) == 5
+    assert tiled.steps_run == expected.steps_run
+    assert tiled.current_map.tiles == expected.current_map.tiles
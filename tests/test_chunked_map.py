@@ -0,0 +1,39 @@
+from game_map.chunked_map import BSPChunks, CaveChunks, ChunkedMap
+
+
+def test_chunks_regenerate_the_same():
+    with ChunkedMap(CaveChunks(seed=3), chunk_size=16, cache_size=1) as world:
+        first = world.region(-20, -20, 40, 40).printable_map()
+    with ChunkedMap(CaveChunks(seed=3), chunk_size=16, cache_size=64) as world:
+        assert world.region(-20, -20, 40, 40).printable_map() == first
+
+
+def test_set_tile_survives_eviction():
+    with ChunkedMap(BSPChunks(seed=1), chunk_size=24, cache_size=1) as world:
+        value = world.block_move(5, 5)
+        world.set_tile(5, 5, not value)
+        world.chunk(1, 0)
+        assert world.block_move(5, 5) == (not value)
+        assert world.loaded == 1
+
+
+def test_direct_edit_survives_eviction_after_a_save():
+    with ChunkedMap(BSPChunks(seed=1), chunk_size=24, cache_size=1) as world:
+        chunk = world.chunk(0, 0)
+        value = chunk.tiles[5][5].block_move
+        world.chunk(1, 0)
+        # Reloaded from its saved copy, then edited on the GameMap itself
+        chunk = world.chunk(0, 0)
+        chunk.tiles[5][5].block(not value)
+        world.chunk(1, 0)
+        assert world.block_move(5, 5) == (not value)
+
+
+def test_cache_dir_is_read_back_after_close(tmp_path):
+    cache_dir = str(tmp_path)
+    with ChunkedMap(BSPChunks(seed=2), chunk_size=24, cache_dir=cache_dir) as world:
+        value = world.block_move(-3, 7)
+        world.set_tile(-3, 7, not value)
+    with ChunkedMap(BSPChunks(seed=2), chunk_size=24, cache_dir=cache_dir) as world:
+        assert world.block_move(-3, 7) == (not value)
+        assert world.loaded == 1 and world.generated == 0
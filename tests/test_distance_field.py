@@ -0,0 +1,79 @@
+import random
+
+from bsp.bsp_dungeon import BSPDungeon
+from game_map.distance_field import UNREACHED, DistanceField
+from game_map.game_map import GameMap
+
+
+def _dungeon(seed):
+    dungeon = BSPDungeon(GameMap(60, 40), random.Random(seed))
+    dungeon.generate()
+    return dungeon
+
+
+def _fresh(field):
+    """
+    :return array: the field's distances computed from scratch
+    """
+    fresh = DistanceField(field.layers, [])
+    fresh.sources = set(field.sources)
+    fresh.compute()
+    return fresh.values
+
+
+def test_updates_match_full_compute():
+    for seed in range(3):
+        dungeon = _dungeon(seed)
+        game_map = dungeon.game_map
+        rng = random.Random(seed)
+        rooms = dungeon.rooms_list
+        source = rooms[0].center()
+        field = game_map.add_distance_field("players", [source])
+        for _ in range(40):
+            action = rng.randrange(4)
+            x, y = rng.randrange(game_map.width), rng.randrange(game_map.height)
+            if action == 0:
+                game_map.fill_rect(x, y, x + rng.randint(0, 3), y + rng.randint(0, 3), True)
+            elif action == 1:
+                game_map.fill_rect(x, y, x + rng.randint(0, 5), y, False)
+            elif action == 2:
+                game_map.set_tile(x, y, rng.random() < 0.5)
+            else:
+                new = rng.choice(rooms).center()
+                field.move_source(source, new)
+                source = new
+            assert field.values == _fresh(field)
+
+
+def test_blocking_the_only_way_raises_distances():
+    game_map = GameMap(20, 5)
+    game_map.clear_map()
+    game_map.create_h_tunnel(1, 18, 2)
+    field = game_map.add_distance_field("exit", [(1, 2)])
+    assert field.distance(18, 2) == 17
+    game_map.set_tile(10, 2, True)
+    assert field.distance(9, 2) == 8
+    assert field.distance(11, 2) == UNREACHED
+    assert field.distance(18, 2) == UNREACHED
+    game_map.set_tile(10, 2, False)
+    assert field.distance(18, 2) == 17
+
+
+def test_carving_spreads_distances():
+    game_map = GameMap(20, 5)
+    game_map.clear_map()
+    game_map.create_h_tunnel(1, 5, 2)
+    field = game_map.add_distance_field("exit", [(1, 2)])
+    assert field.distance(10, 2) == UNREACHED
+    game_map.create_h_tunnel(6, 10, 2)
+    assert field.distance(10, 2) == 9
+
+
+def test_add_many_matches_add():
+    dungeon = _dungeon(7)
+    game_map = dungeon.game_map
+    layers = {"room_{}".format(i): [room.center()] for i, room in enumerate(dungeon.rooms_list[:4])}
+    layers["all"] = [room.center() for room in dungeon.rooms_list]
+    together = game_map.add_distance_fields(layers)
+    for name, field in zip(layers, together):
+        assert field.values == game_map.add_distance_field(name, layers[name]).values
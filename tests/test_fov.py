@@ -0,0 +1,54 @@
+import random
+
+from bsp.bsp_dungeon import BSPDungeon
+from game_map.fov import FieldOfView, compute_fov
+from game_map.game_map import GameMap
+
+
+def test_open_room_is_fully_visible():
+    game_map = GameMap(20, 20)
+    game_map.clear_map()
+    game_map.fill_rect(5, 5, 9, 9, False)
+    visible = compute_fov(game_map, 7, 7, 10)
+    for x in range(4, 11):
+        for y in range(4, 11):
+            assert game_map.index(x, y) in visible
+    assert game_map.index(3, 7) not in visible
+
+
+def test_outside_the_map_sees_nothing():
+    game_map = GameMap(10, 10)
+    game_map.clear_map(False, False)
+    assert compute_fov(game_map, -1, 3, 5) == set()
+
+
+def test_cache_matches_fresh_fov_after_edits():
+    dungeon = BSPDungeon(GameMap(60, 40), random.Random(2))
+    dungeon.generate()
+    game_map = dungeon.game_map
+    fov = FieldOfView(game_map, max_entries=16)
+    rng = random.Random(2)
+    viewers = [room.center() + (rng.randint(3, 10),) for room in dungeon.rooms_list]
+    for _ in range(60):
+        x, y, radius = rng.choice(viewers)
+        assert fov.visible(x, y, radius) == compute_fov(game_map, x, y, radius)
+        if rng.random() < 0.3:
+            tx, ty = rng.randrange(game_map.width), rng.randrange(game_map.height)
+            game_map.fill_rect(tx, ty, tx + rng.randint(0, 2), ty, rng.random() < 0.5)
+    assert fov.hits and fov.misses
+    assert len(fov.cache) <= 16
+
+
+def test_edit_only_drops_views_that_reach_it():
+    game_map = GameMap(40, 10)
+    game_map.clear_map(False, False)
+    fov = FieldOfView(game_map)
+    fov.visible(5, 5, 3)
+    fov.visible(30, 5, 3)
+    game_map.set_tile(31, 5, True)
+    assert (5, 5, 3) in fov.cache
+    assert (30, 5, 3) not in fov.cache
+    assert game_map.index(32, 5) not in fov.visible(30, 5, 3)
+    fov.close()
+    game_map.set_tile(6, 5, True)
+    assert not fov.cache
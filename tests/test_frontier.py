@@ -0,0 +1,83 @@
+import random
+from collections import Counter
+
+from game_map.direction import Direction
+from game_map.game_map import GameMap
+from game_map.rect import Rect
+from game_map.spatial_index import SpatialIndex
+from miner.frontier import FrontierIndex, _FenwickTree
+
+
+def test_fenwick_prefix_sums_and_find():
+    rng = random.Random(0)
+    tree = _FenwickTree()
+    weights = []
+    for _ in range(200):
+        if weights and rng.random() < 0.4:
+            slot = rng.randrange(len(weights))
+            weights[slot] = rng.randint(0, 9)
+            tree.update(slot, weights[slot])
+        else:
+            weights.append(rng.randint(0, 9))
+            tree.append(weights[-1])
+        assert tree.total == sum(weights)
+        for count in range(len(weights) + 1):
+            assert tree._prefix(count) == sum(weights[:count])
+    for target in range(tree.total):
+        running = 0
+        for slot, weight in enumerate(weights):
+            running += weight
+            if running > target:
+                break
+        assert tree.find(target) == slot
+
+
+def _frontier(features):
+    index = SpatialIndex()
+    frontier = FrontierIndex(GameMap(40, 40), index)
+    for feature in features:
+        index.insert(feature)
+        frontier.add_feature(feature)
+    return frontier
+
+
+def test_depth_is_limited_by_the_edge_and_other_features():
+    room = Rect(10, 10, 4, 4)
+    frontier = _frontier([room, Rect(18, 8, 3, 10)])
+    assert frontier.depth(room, Direction.UP) == 9
+    assert frontier.depth(room, Direction.LEFT) == 9
+    assert frontier.depth(room, Direction.DOWN) == 12
+    assert frontier.depth(room, Direction.RIGHT) == 3
+
+
+def test_sampling_odds_follow_current_depth():
+    room = Rect(10, 10, 4, 4)
+    frontier = _frontier([room])
+    # Added after the walls were weighted, so stored weights are stale
+    blocker = Rect(18, 8, 3, 10)
+    frontier.feature_index.insert(blocker)
+    rng = random.Random(1)
+    draws = Counter()
+    for _ in range(20000):
+        slot, feature, direction, depth = frontier.sample(rng)
+        if feature is room:
+            draws[direction] += 1
+    depths = {direction: frontier.depth(room, direction) for direction in Direction}
+    room_draws = sum(draws.values())
+    room_total = sum(depths.values())
+    for direction, depth in depths.items():
+        assert abs(draws[direction] / room_draws - depth / room_total) < 0.02
+
+
+def test_shallow_and_failing_walls_are_dropped():
+    frontier = _frontier([Rect(1, 1, 3, 3)])
+    rng = random.Random(2)
+    for _ in range(200):
+        slot, feature, direction, depth = frontier.sample(rng)
+        assert depth >= frontier.min_depth
+        assert direction in (Direction.RIGHT, Direction.DOWN)
+    assert len(frontier) == 2
+    slot = frontier.sample(rng)[0]
+    assert not any(frontier.failed(slot) for _ in range(frontier.retire_after - 1))
+    assert frontier.failed(slot)
+    assert len(frontier) == 1
@@ -0,0 +1,54 @@
+import random
+import time
+
+from bsp.bsp_dungeon import BSPDungeon
+from cell.cellular_automaton_dungeon import CADungeon
+from game_map.game_map import GameMap
+from game_map.instrumentation import GenerationStats
+from miner import miner_old
+from tutorial_dungeon.tutorial_dungeon import TutorialDungeon
+
+
+def test_bsp_phases_do_not_overlap():
+    stats = GenerationStats()
+    dungeon = BSPDungeon(GameMap(200, 100), random.Random(0), stats=stats)
+    start = time.perf_counter()
+    dungeon.generate()
+    elapsed = time.perf_counter() - start
+    assert set(stats.phases) == {"split", "generate_rooms", "fill_grid", "corridors"}
+    assert sum(phase["seconds"] for phase in stats.phases.values()) <= elapsed
+
+
+def test_stats_do_not_change_the_map():
+    plain = BSPDungeon(GameMap(80, 40), random.Random(1))
+    plain.generate()
+    timed = BSPDungeon(GameMap(80, 40), random.Random(1), stats=GenerationStats())
+    timed.generate()
+    assert plain.game_map.printable_map() == timed.game_map.printable_map()
+
+
+def test_tutorial_counts_rooms():
+    stats = GenerationStats()
+    dungeon = TutorialDungeon(GameMap(80, 40), random.Random(2), stats=stats)
+    dungeon.generate(max_rooms=20)
+    counters = stats.counters
+    assert counters["rooms_attempted"] == 20
+    assert counters["rooms"] == len(dungeon.rooms_list)
+    assert counters["rooms"] + counters.get("rooms_rejected_overlap", 0) == 20
+    assert counters["corridors"] == len(dungeon.rooms_list) - 1
+    assert set(stats.phases) == {"place_rooms", "corridors"}
+
+
+def test_miner_old_counts_features():
+    stats = GenerationStats()
+    miner = miner_old.Miner(GameMap(80, 40), random.Random(3), stats=stats)
+    added = miner.generate_features(20)
+    assert stats.counters["features_added"] == added == len(miner.features) - 1
+    assert stats.phases["add_feature"]["calls"] == stats.counters["features_attempted"]
+
+
+def test_ca_records_steps():
+    stats = GenerationStats()
+    dungeon = CADungeon(40, 30, rng=random.Random(4), stats=stats)
+    ran = dungeon.generate(5)
+    assert stats.phases["ca_step"]["calls"] == len(stats.series["cells_changed"]) == ran
@@ -0,0 +1,64 @@
+import io
+import random
+
+import pytest
+
+from bsp.bsp_dungeon import BSPDungeon
+from cell.cellular_automaton_dungeon import CADungeon, CAMap
+from game_map.game_map import GameMap
+from game_map.map_file import (load_map, open_map, pack_plane, save_map,
+                               unpack_plane, write_map)
+
+
+@pytest.mark.parametrize("count", [0, 1, 7, 8, 9, 100])
+def test_pack_plane_round_trip(count):
+    plane = bytes(random.Random(count).randint(0, 1) for _ in range(count))
+    assert unpack_plane(pack_plane(plane), count) == plane
+
+
+def test_game_map_round_trip(tmp_path):
+    dungeon = BSPDungeon(GameMap(53, 31), random.Random(4))
+    dungeon.generate()
+    dungeon.game_map.fill_rect(1, 1, 1, 1, False)
+    dungeon.game_map.block_sight_plane[0] = 0
+    path = str(tmp_path / "bsp.dgm")
+    save_map(path, dungeon.game_map, dungeon.rooms_list)
+
+    loaded, rooms = load_map(path)
+    assert type(loaded) is GameMap
+    assert loaded.block_move_plane == dungeon.game_map.block_move_plane
+    assert loaded.block_sight_plane == dungeon.game_map.block_sight_plane
+    assert [(r.x1, r.y1, r.width, r.height) for r in rooms] == \
+        [(r.x1, r.y1, r.width, r.height) for r in dungeon.rooms_list]
+
+    with open_map(path) as mapped:
+        for x, y in [(0, 0), (1, 1), (52, 30), (20, 15)]:
+            assert mapped.block_move(x, y) == dungeon.game_map.tiles[x][y].block_move
+        with pytest.raises(IndexError):
+            mapped.block_move(53, 0)
+
+
+def test_ca_map_round_trip(tmp_path):
+    dungeon = CADungeon(37, 21, rng=random.Random(5))
+    dungeon.generate(3)
+    path = str(tmp_path / "cave.dgm")
+    save_map(path, dungeon.current_map)
+
+    loaded, rooms = load_map(path)
+    assert type(loaded) is CAMap
+    assert loaded.tiles == dungeon.current_map.tiles
+    assert rooms == []
+    with open_map(path) as mapped:
+        assert mapped.alive(3, 4) == dungeon.current_map.tiles[3][4]
+
+
+def test_not_a_map_file(tmp_path):
+    path = tmp_path / "junk.dgm"
+    path.write_bytes(b"JUNK" + bytes(30))
+    with pytest.raises(ValueError):
+        open_map(str(path))
+
+
+def test_unregistered_map_kind():
+    with pytest.raises(TypeError):
+        write_map(io.BytesIO(), object())
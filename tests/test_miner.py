@@ -0,0 +1,46 @@
+import random
+
+from game_map.game_map import GameMap
+from miner.miner import Miner
+
+
+def seeded_miner(seed):
+    miner = Miner(GameMap(80, 25), random.Random(seed))
+    miner.add_feature(30, 10, 5, 5)
+    return miner
+
+
+def test_fix_bounds_never_raises_or_makes_negative_features():
+    for seed in range(15):
+        miner = seeded_miner(seed)
+        for _ in range(40):
+            miner.generate_feature(fix_bounds=True)
+        for feature in miner.features:
+            assert feature.x1 <= feature.x2 and feature.y1 <= feature.y2
+            assert miner.game_map.room_in_map(feature)
+        for position, feature in enumerate(miner.features):
+            assert not any(feature.intersect(other) for other in miner.features[position + 1:])
+
+
+def test_default_keeps_the_original_behaviour():
+    # The original algorithm raises at the map edge and can make features
+    # of negative size; both happen within a few seeds
+    raised = negative = False
+    for seed in range(15):
+        miner = seeded_miner(seed)
+        try:
+            for _ in range(40):
+                miner.generate_feature()
+        except ValueError:
+            raised = True
+        negative = negative or any(feature.x1 > feature.x2 or feature.y1 > feature.y2
+                                   for feature in miner.features)
+    assert raised and negative
+
+
+def test_generate_adds_features_inside_the_map():
+    miner = Miner(GameMap(120, 60), random.Random(3))
+    assert miner.generate(50) == 50
+    for feature in miner.features:
+        assert miner.game_map.room_in_map(feature)
+        assert feature.x1 <= feature.x2 and feature.y1 <= feature.y2
@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from bsp.bsp_dungeon import BSPDungeon
+from cell.cellular_automaton_dungeon import CADungeon, numpy
+from game_map.game_map import GameMap
+from game_map.rng import NumpyRandom
+from miner import miner_old
+from miner.miner import Miner
+from tutorial_dungeon.tutorial_dungeon import TutorialDungeon
+
+needs_numpy = pytest.mark.skipif(numpy is None, reason="numpy is not installed")
+
+
+def make_rngs(seed):
+    rngs = [random.Random(seed)]
+    if numpy is not None:
+        rngs.append(numpy.random.default_rng(seed))
+    return rngs
+
+
+def bsp_map(rng):
+    dungeon = BSPDungeon(GameMap(80, 50), rng)
+    dungeon.generate(corridors="tree")
+    return dungeon.game_map.printable_map()
+
+
+def tutorial_map(rng):
+    dungeon = TutorialDungeon(GameMap(80, 50), rng)
+    dungeon.generate(max_rooms=15, placement="free_space")
+    return dungeon.game_map.printable_map()
+
+
+def miner_map(rng):
+    dungeon = Miner(GameMap(80, 50), rng)
+    dungeon.generate(25)
+    return dungeon.game_map.printable_map()
+
+
+def miner_old_map(rng):
+    dungeon = miner_old.Miner(GameMap(80, 50), rng)
+    dungeon.generate_features(25, 25)
+    return dungeon.game_map.printable_map()
+
+
+def cave_map(rng):
+    dungeon = CADungeon(60, 40, rng=rng)
+    dungeon.generate(4)
+    return dungeon.current_map.printable_map()
+
+
+@pytest.mark.parametrize("build", [bsp_map, tutorial_map, miner_map, miner_old_map, cave_map])
+def test_same_seed_gives_the_same_map(build):
+    for first, second in zip(make_rngs(5), make_rngs(5)):
+        assert build(first) == build(second)
+    assert build(random.Random(5)) != build(random.Random(6))
+
+
+@needs_numpy
+def test_numpy_random_ranges():
+    rng = NumpyRandom(numpy.random.default_rng(0))
+    assert {rng.randint(2, 4) for _ in range(200)} == {2, 3, 4}
+    assert {rng.randrange(3) for _ in range(200)} == {0, 1, 2}
+    assert {rng.randrange(1, 9, 3) for _ in range(200)} == {1, 4, 7}
+    assert {rng.choice("ab") for _ in range(200)} == {"a", "b"}
+    assert all(0 <= rng.random() < 1 for _ in range(200))
+    with pytest.raises(ValueError):
+        rng.randrange(0)
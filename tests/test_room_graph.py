@@ -0,0 +1,146 @@
+import random
+
+from bsp.bsp_dungeon import BSPDungeon
+from game_map.game_map import GameMap
+from game_map.room_graph import UNREACHABLE, grid_path
+from miner.miner import Miner
+from tutorial_dungeon.tutorial_dungeon import TutorialDungeon
+
+
+def tutorial_dungeon(seed):
+    dungeon = TutorialDungeon(GameMap(120, 60), random.Random(seed))
+    dungeon.generate(max_rooms=30)
+    return dungeon
+
+
+def open_tiles(game_map):
+    return [(x, y) for y in range(game_map.height) for x in range(game_map.width)
+            if not game_map.tiles[x][y].block_move]
+
+
+def assert_walkable(game_map, path, start, goal):
+    assert path[0] == start and path[-1] == goal
+    for (x1, y1), (x2, y2) in zip(path, path[1:]):
+        assert abs(x1 - x2) + abs(y1 - y2) == 1
+    assert not any(game_map.tiles[x][y].block_move for x, y in path)
+
+
+def test_tutorial_paths_are_as_short_as_bfs():
+    for seed in range(3):
+        dungeon = tutorial_dungeon(seed)
+        game_map, graph = dungeon.game_map, dungeon.room_graph
+        tiles = open_tiles(game_map)
+        rng = random.Random(seed)
+        for _ in range(30):
+            start, goal = rng.choice(tiles), rng.choice(tiles)
+            path = graph.find_path(game_map, start, goal)
+            expected = grid_path(game_map, start, goal)
+            assert (path is None) == (expected is None)
+            if path is not None:
+                assert_walkable(game_map, path, start, goal)
+                assert len(path) == len(expected)
+
+
+def test_tutorial_room_distances_match_bfs():
+    dungeon = tutorial_dungeon(4)
+    game_map, graph = dungeon.game_map, dungeon.room_graph
+    expected = {}
+    for a in range(len(graph)):
+        for b in range(len(graph)):
+            path = grid_path(game_map, graph.tile(graph.anchors[a]), graph.tile(graph.anchors[b]))
+            expected[a, b] = UNREACHABLE if path is None else len(path) - 1
+    for (a, b), distance in expected.items():
+        assert graph.distance(a, b) == distance
+    graph.compute_distances()
+    for (a, b), distance in expected.items():
+        assert graph.distance(a, b) == distance
+        if distance != UNREACHABLE and a != b:
+            assert graph.next_hop[a * len(graph) + b] in graph.neighbors(a)
+
+
+def test_every_open_tile_has_a_region():
+    dungeon = tutorial_dungeon(5)
+    game_map, graph = dungeon.game_map, dungeon.room_graph
+    rooms = corridors = 0
+    for x, y in open_tiles(game_map):
+        if graph.room_at(x, y) is not None:
+            rooms += 1
+        else:
+            corridor = graph.corridor_at(x, y)
+            assert corridor is not None and corridor.rooms
+            corridors += 1
+    assert rooms and corridors
+    for x, y in ((0, 0), (-1, 5), (game_map.width, 0)):
+        assert graph.region_at(x, y) is None
+
+
+def test_route_follows_rooms_passed():
+    dungeon = tutorial_dungeon(6)
+    graph = dungeon.room_graph
+    route = graph.route(0, len(graph) - 1)
+    assert route[0] == 0 and route[-1] == len(graph) - 1
+    for room, following in zip(route, route[1:]):
+        assert following in graph.neighbors(room)
+
+
+def test_blocked_path_falls_back_to_grid_search():
+    dungeon = tutorial_dungeon(7)
+    game_map, graph = dungeon.game_map, dungeon.room_graph
+    start = graph.tile(graph.anchors[0])
+    goal = graph.tile(graph.anchors[-1])
+    path = graph.find_path(game_map, start, goal)
+    x, y = path[len(path) // 2]
+    game_map.tiles[x][y].block_move = True
+    assert graph.find_path(game_map, start, goal) == grid_path(game_map, start, goal)
+
+
+def test_bsp_and_miner_paths_are_as_short_as_bfs():
+    bsp = BSPDungeon(GameMap(120, 60), random.Random(8))
+    bsp.generate(corridors="tree")
+    miner = Miner(GameMap(120, 60), random.Random(8))
+    miner.generate(60)
+    for dungeon in (bsp, miner):
+        game_map, graph = dungeon.game_map, dungeon.room_graph
+        tiles = open_tiles(game_map)
+        rng = random.Random(9)
+        for _ in range(30):
+            start, goal = rng.choice(tiles), rng.choice(tiles)
+            path = graph.find_path(game_map, start, goal)
+            assert len(path) == len(grid_path(game_map, start, goal))
+
+
+def assert_rooms_labelled_inside(dungeon, extents):
+    game_map, graph = dungeon.game_map, dungeon.room_graph
+    for x, y in open_tiles(game_map):
+        room = graph.room_at(x, y)
+        if room is not None:
+            x1, y1, x2, y2 = extents(dungeon.rooms_list[room])
+            assert x1 <= x <= x2 and y1 <= y <= y2
+
+
+def test_bsp_fill_rooms_cover_only_their_own_tiles():
+    dungeon = BSPDungeon(GameMap(120, 80), random.Random(0))
+    dungeon.generate(fill=True)
+    graph = dungeon.room_graph
+    assert_rooms_labelled_inside(dungeon, lambda r: (r.x1, r.y1, r.x2 - 1, r.y2 - 1))
+    # Filled leaves tile the whole map, so every open tile is in a room
+    # and there are no corridor regions
+    assert len(graph.region_nodes) == len(dungeon.rooms_list) + len(graph.sections)
+    assert not graph.sections
+    # Nodes are the room centres and the tiles where two rooms meet
+    region = graph.region
+    for node in graph.links:
+        assert node in graph.anchors or any(
+            region[neighbor] >= 0 and region[neighbor] != region[node]
+            for neighbor in (node - 1, node + 1, node - graph.stride, node + graph.stride))
+    tiles = open_tiles(dungeon.game_map)
+    rng = random.Random(1)
+    for _ in range(20):
+        start, goal = rng.choice(tiles), rng.choice(tiles)
+        path = graph.find_path(dungeon.game_map, start, goal)
+        assert len(path) == len(grid_path(dungeon.game_map, start, goal))
+
+
+def test_tutorial_rooms_cover_only_their_interior():
+    dungeon = tutorial_dungeon(2)
+    assert_rooms_labelled_inside(dungeon, lambda r: (r.x1 + 1, r.y1 + 1, r.x2 - 1, r.y2 - 1))
@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from bsp.bsp_dungeon import BSPDungeon
+from cell.cellular_automaton_dungeon import CADungeon
+from game_map.game_map import GameMap
+from miner.miner import Miner
+from tutorial_dungeon.tutorial_dungeon import TutorialDungeon
+
+
+@pytest.mark.parametrize("corridors", ["sequential", "tree"])
+def test_bsp_stream_matches_generate(corridors):
+    for seed in range(4):
+        built = BSPDungeon(GameMap(90, 60), random.Random(seed))
+        built.generate(corridors=corridors)
+        streamed = BSPDungeon(GameMap(90, 60), random.Random(seed))
+        text = "".join(streamed.stream(corridors=corridors, band=7))
+        assert text == built.game_map.printable_map()
+        assert streamed.corridor_tiles == built.corridor_tiles
+
+
+def test_bsp_stream_yields_before_the_last_corridor():
+    dungeon = BSPDungeon(GameMap(90, 60), random.Random(0))
+    bands = dungeon.stream(band=1)
+    next(bands)
+    assert dungeon.game_map.printable_map() != _generated_bsp(0)
+
+
+def _generated_bsp(seed):
+    dungeon = BSPDungeon(GameMap(90, 60), random.Random(seed))
+    dungeon.generate()
+    return dungeon.game_map.printable_map()
+
+
+@pytest.mark.parametrize("placement", ["random", "free_space"])
+def test_tutorial_stream_matches_generate(placement):
+    for seed in range(4):
+        built = TutorialDungeon(GameMap(80, 50), random.Random(seed))
+        built.generate(max_rooms=20, placement=placement)
+        streamed = TutorialDungeon(GameMap(80, 50), random.Random(seed))
+        text = "".join(streamed.stream(max_rooms=20, placement=placement, band=5))
+        assert text == built.game_map.printable_map()
+
+
+def test_miner_stream_matches_generate():
+    built = Miner(GameMap(80, 50), random.Random(3))
+    built.generate(30)
+    streamed = Miner(GameMap(80, 50), random.Random(3))
+    assert "".join(streamed.stream(30, band=6)) == built.game_map.printable_map()
+
+
+def test_ca_stream_matches_generate():
+    built = CADungeon(60, 40, rng=random.Random(2))
+    built.generate(4)
+    streamed = CADungeon(60, 40, rng=random.Random(2))
+    assert "".join(streamed.stream(4, band=9)) == built.current_map.printable_map()
+
+
+def test_bad_band_raises_on_call():
+    with pytest.raises(ValueError):
+        BSPDungeon(GameMap(20, 20)).stream(band=0)
+    with pytest.raises(ValueError):
+        TutorialDungeon(GameMap(20, 20)).stream(band=0)
+    with pytest.raises(ValueError):
+        Miner(GameMap(20, 20)).stream(5, band=0)
+    with pytest.raises(ValueError):
+        CADungeon(20, 20).stream(band=0)
+    with pytest.raises(ValueError):
+        GameMap(20, 20).iter_bands(0)
+
+
+def test_row_bytes_are_bytes():
+    game_map = GameMap(12, 4)
+    game_map.clear_map()
+    game_map.create_h_tunnel(2, 8, 1)
+    rows = list(game_map.iter_row_bytes())
+    assert all(type(row) is bytes for row in rows)
+    assert b"\n".join(rows) + b"\n" == game_map.printable_bytes()
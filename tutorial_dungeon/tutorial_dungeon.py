@@ -1,7 +1,11 @@
 from game_map.game_map import GameMap
+from game_map.instrumentation import timed_phase
+from game_map.occupancy_grid import OccupancyGrid
 from game_map.rect import Rect
-
-from random import randint
+from game_map.render import check_band
+from game_map.rng import as_random
+from game_map.room_graph import RoomGraph
+from game_map.spatial_index import SpatialIndex
 
 
 class TutorialDungeon:
@@ -14,83 +18,182 @@ class TutorialDungeon:
         After all rooms added
             connect each room with the previous room using a corridor
     """
-    def __init__(self, game_map):
+    def __init__(self, game_map, rng=None, stats=None):
         """
         :param GameMap game_map:
+        :param rng: random number generator, random.Random(seed) or a numpy
+            Generator, defaults to the random module
+        :param GenerationStats stats: optional, collects phase timings and counters
         """
+        self.rng = as_random(rng)
+        self.stats = stats
         self.game_map = game_map
         self.width = game_map.width
         self.height = game_map.height
         self.game_map.clear_map()
         self.rooms_list = []
+        self.room_index = SpatialIndex()
+        self._room_graph = None
 
-    def generate(self, max_rooms=1, room_min_size=5, room_max_size=10):
+    def generate(self, max_rooms=1, room_min_size=5, room_max_size=10, placement="random"):
         """
         Create initial Map Layout
         :param int max_rooms: Number of rooms to attempt to generate
         :param int room_min_size: Smallest allowable room (width or height)
         :param int room_max_size: Largest allowable room (width or height)
+        :param str placement: "random" tries blind positions and discards
+            overlapping rooms; "free_space" only picks positions where a room
+            of the chosen size fits, so nearly every attempt succeeds
+        """
+        _check_placement(placement)
+        self._room_graph = None
+        self._place_rooms(max_rooms, room_min_size, room_max_size, placement)
+        self._generate_corridors()
+
+    def stream(self, max_rooms=1, room_min_size=5, room_max_size=10, placement="random",
+               band=64, block_char="#", open_char="."):
+        """
+        Generate the dungeon while yielding it rendered a band of rows at a
+        time. The rooms are placed and the corridors planned first; the
+        corridors are then dug from the top of the map down, and each band
+        is yielded as soon as no corridor left to dig reaches it. The map
+        is the same as the one generate makes.
+        :param int max_rooms: see generate
+        :param int room_min_size: see generate
+        :param int room_max_size: see generate
+        :param str placement: see generate
+        :param int band: most rows per band
+        :param block_char: symbol to represent a sight-blocking tile
+        :param open_char: symbol to represent a see-through tile
+        :return: generator of str, every row newline-terminated
+        """
+        _check_placement(placement)
+        check_band(band)
+        return self._stream(max_rooms, room_min_size, room_max_size, placement,
+                            band, block_char, open_char)
+
+    def _stream(self, max_rooms, room_min_size, room_max_size, placement,
+                band, block_char, open_char):
+        self._room_graph = None
+        self._place_rooms(max_rooms, room_min_size, room_max_size, placement)
+        segments = self._generate_corridors(dig=False)
+        yield from self.game_map.iter_bands_digging(segments, self._dig, band,
+                                                    block_char, open_char)
+
+    @timed_phase("place_rooms")
+    def _place_rooms(self, max_rooms, room_min_size, room_max_size, placement):
+        """
+        Add rooms to the map, see generate
         """
         num_rooms = 0
+        occupancy = None
+        if placement == "free_space":
+            occupancy = OccupancyGrid(self.width, self.height)
+            for room in self.rooms_list:
+                occupancy.occupy(room)
 
         for r in range(max_rooms):
             # random width and height
-            w = randint(room_min_size, room_max_size)
-            h = randint(room_min_size, room_max_size)
+            w = self.rng.randint(room_min_size, room_max_size)
+            h = self.rng.randint(room_min_size, room_max_size)
+            if self.stats is not None:
+                self.stats.count("rooms_attempted")
+
+            if occupancy is not None:
+                position = occupancy.sample(w, h, self.rng)
+                if position is None:
+                    if self.stats is not None:
+                        self.stats.count("rooms_rejected_no_space")
+                    continue
+                new_room = Rect(position[0], position[1], w, h)
+                self._create_room(new_room)
+                self.rooms_list.append(new_room)
+                self.room_index.insert(new_room)
+                occupancy.occupy(new_room)
+                num_rooms += 1
+                continue
+
             # random position without going out of the boundaries of the map
-            x = randint(0, self.width - w - 1)
-            y = randint(0, self.height - h - 1)
+            x = self.rng.randint(0, self.width - w - 1)
+            y = self.rng.randint(0, self.height - h - 1)
 
             # Room class stores some useful features
             new_room = Rect(x, y, w, h)
 
-            # run through the other rooms and see if they intersect with this one
-            for other_room in self.rooms_list:
-                if new_room.intersect(other_room):
-                    break
-            else:
+            # see if any of the other rooms intersect with this one
+            if not self.room_index.intersects(new_room):
                 # this means there are no intersections, so this room is valid
                 # "paint" it to the map's tiles
                 self._create_room(new_room)
 
                 # finally, append the new room to the list
                 self.rooms_list.append(new_room)
+                self.room_index.insert(new_room)
                 num_rooms += 1
-        self._generate_corridors()
+            elif self.stats is not None:
+                self.stats.count("rooms_rejected_overlap")
+        if self.stats is not None:
+            self.stats.count("rooms", num_rooms)
+
+    @property
+    def room_graph(self):
+        """
+        :return RoomGraph: rooms and corridors of the generated map, built on first use
+        """
+        if self._room_graph is None:
+            # Only the interior of a room is carved, see _create_room
+            extents = [(room.x1 + 1, room.y1 + 1, room.x2 - 1, room.y2 - 1)
+                       for room in self.rooms_list]
+            self._room_graph = RoomGraph(self.game_map, self.rooms_list, extents)
+        return self._room_graph
 
     def _create_room(self, room):
         """
         Set the tiles of a room to be passable
         :param Map.room.Room room: The room in the map
         """
+        if self.stats is not None:
+            self.stats.count("tiles_written", max(room.width - 1, 0) * max(room.height - 1, 0))
         # Make interior tiles passable
-        for x in range(room.x1 + 1, room.x2):
-            for y in range(room.y1 + 1, room.y2):
-                self.game_map.tiles[x][y].block()
+        self.game_map.fill_rect(room.x1 + 1, room.y1 + 1, room.x2 - 1, room.y2 - 1, False)
 
-    def _generate_corridors(self):
+    @timed_phase("corridors")
+    def _generate_corridors(self, dig=True):
         """
         Add connecting corridors between rooms
+        :param bool dig: dig the corridors, or only plan them
+        :return list: corridor segments as Rects, in digging order
         """
-        first_room = True
-        new_x, new_y = 0, 0
-        for room in self.rooms_list:
-            if first_room:
-                first_room = False
-                new_x, new_y = room.center()
+        segments = []
+        for previous, room in zip(self.rooms_list, self.rooms_list[1:]):
+            prev_x, prev_y = previous.center()
+            new_x, new_y = room.center()
+            if self.stats is not None:
+                self.stats.count("corridors")
+                self.stats.count("tiles_written", abs(new_x - prev_x) + abs(new_y - prev_y) + 2)
+            # Randomly determine corridor arrangement.
+            if self.rng.randint(0, 1) == 1:
+                # Horizontal tunnel, then Vertical
+                segments.append(Rect(min(prev_x, new_x), prev_y, abs(new_x - prev_x), 0))
+                segments.append(Rect(new_x, min(prev_y, new_y), 0, abs(new_y - prev_y)))
             else:
-                prev_x, prev_y = new_x, new_y
-                new_x, new_y = room.center()
-                # Randomly determine corridor arrangement.
-                if randint(0, 1) == 1:
-                    # Horizontal tunnel, then Vertical
-                    self._create_h_tunnel(prev_x, new_x, prev_y)
-                    self._create_v_tunnel(prev_y, new_y, new_x)
-                else:
-                    # Vertical tunnel, then Horizontal
-                    self._create_v_tunnel(prev_y, new_y, prev_x)
-                    self._create_h_tunnel(prev_x, new_x, new_y)
-                pass
+                # Vertical tunnel, then Horizontal
+                segments.append(Rect(prev_x, min(prev_y, new_y), 0, abs(new_y - prev_y)))
+                segments.append(Rect(min(prev_x, new_x), new_y, abs(new_x - prev_x), 0))
+        if dig:
+            for segment in segments:
+                self._dig(segment)
+        return segments
+
+    def _dig(self, segment):
+        """
+        Dig one corridor segment
+        :param Rect segment: a segment from _generate_corridors
+        """
+        if segment.height == 0:
+            self._create_h_tunnel(segment.x1, segment.x2, segment.y1)
+        else:
+            self._create_v_tunnel(segment.y1, segment.y2, segment.x1)
 
     def _create_h_tunnel(self, x1, x2, y):
         """
@@ -99,8 +202,7 @@ class TutorialDungeon:
         :param int x2: End of Tunnel
         :param int y: The y position of the tunnel
         """
-        for x in range(min(x1, x2), max(x1, x2) + 1):
-            self.game_map.tiles[x][y].block(False)
+        self.game_map.create_h_tunnel(x1, x2, y)
 
     def _create_v_tunnel(self, y1, y2, x):
         """
@@ -109,8 +211,12 @@ class TutorialDungeon:
         :param int y2: End of Tunnel
         :param int x: X position of the tunnel
         """
-        for y in range(min(y1, y2), max(y1, y2) + 1):
-            self.game_map.tiles[x][y].block(False)
+        self.game_map.create_v_tunnel(y1, y2, x)
+
+
+def _check_placement(placement):
+    if placement not in ("random", "free_space"):
+        raise ValueError("Unknown placement mode: {}".format(placement))
 
 
 if __name__ == "__main__":